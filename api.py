@@ -0,0 +1,247 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, Response, abort, request, url_for
+
+import deletes
+from models import Artist, Show, Venue, db, genre_names
+from pagination import keyset_page
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+#----------------------------------------------------------------------------#
+# Serialization.
+#----------------------------------------------------------------------------#
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def dumps(payload):
+    # orjson when installed, it serializes datetimes natively
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(',', ':'))
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+#----------------------------------------------------------------------------#
+# Resources.
+#----------------------------------------------------------------------------#
+
+# Stands for the genre names of a row, read for a whole page in one query
+GENRES = object()
+
+# Public field name -> column, in output order. Joined columns are labelled
+# so that rows can be read back by field name.
+RESOURCES = {
+    'venues': {
+        'model': Venue,
+        'fields': {
+            'id': Venue.id,
+            'name': Venue.name,
+            'city': Venue.city,
+            'state': Venue.state,
+            'address': Venue.address,
+            'phone': Venue.phone,
+            'image_link': Venue.image_link,
+            'facebook_link': Venue.facebook_link,
+            'website': Venue.website,
+            'genres': GENRES,
+            'seeking_talent': Venue.seeking_talent,
+            'seeking_description': Venue.seeking_description,
+            'upcoming_shows_count': Venue.upcoming_shows_count,
+            'past_shows_count': Venue.past_shows_count,
+            'updated_at': Venue.updated_at,
+        },
+    },
+    'artists': {
+        'model': Artist,
+        'fields': {
+            'id': Artist.id,
+            'name': Artist.name,
+            'city': Artist.city,
+            'state': Artist.state,
+            'phone': Artist.phone,
+            'image_link': Artist.image_link,
+            'facebook_link': Artist.facebook_link,
+            'website': Artist.website,
+            'genres': GENRES,
+            'seeking_venue': Artist.seeking_venue,
+            'seeking_description': Artist.seeking_description,
+            'upcoming_shows_count': Artist.upcoming_shows_count,
+            'past_shows_count': Artist.past_shows_count,
+            'updated_at': Artist.updated_at,
+        },
+    },
+    'shows': {
+        'model': Show,
+        'fields': {
+            'id': Show.id,
+            'start_time': Show.start_time,
+            'venue_id': Show.venue_id,
+            'venue_name': Venue.name.label('venue_name'),
+            'venue_image_link': Venue.image_link.label('venue_image_link'),
+            'artist_id': Show.artist_id,
+            'artist_name': Artist.name.label('artist_name'),
+            'artist_image_link': Artist.image_link.label('artist_image_link'),
+            'updated_at': Show.updated_at,
+        },
+        # Joins needed by each joined field
+        'joins': {
+            'venue_name': (Venue, Show.venue_id == Venue.id),
+            'venue_image_link': (Venue, Show.venue_id == Venue.id),
+            'artist_name': (Artist, Show.artist_id == Artist.id),
+            'artist_image_link': (Artist, Show.artist_id == Artist.id),
+        },
+    },
+}
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def selected_fields(resource):
+    # Fields requested with ?fields=a,b (all by default), id always included
+    fields = resource['fields']
+    requested = request.args.get('fields')
+    if not requested:
+        return list(fields)
+
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        abort(400, 'Unknown field(s): {}'.format(', '.join(unknown)))
+
+    return ['id'] + [name for name in names if name != 'id']
+
+
+def column_names(resource, names):
+    # The requested fields read straight from columns
+    return [name for name in names if resource['fields'][name] is not GENRES]
+
+
+def build_query(resource, names):
+    # Column-level select of the requested fields, rows come back as tuples
+    # of column_names(). `id` comes first so the select is anchored on the
+    # resource table.
+    query = db.session.query(*[resource['fields'][name] for name in column_names(resource, names)])
+
+    joined = set()
+    for name in names:
+        join = resource.get('joins', {}).get(name)
+        if join is not None and join[0] not in joined:
+            query = query.join(*join)
+            joined.add(join[0])
+
+    return query
+
+
+def to_records(resource, names, rows):
+    # Rows of build_query() as dicts of `names`, with the genres of all of
+    # them read in one query
+    records = [dict(zip(column_names(resource, names), row)) for row in rows]
+
+    if 'genres' in names:
+        genres = genre_names(resource['model'], [record['id'] for record in records])
+        for record in records:
+            record['genres'] = genres.get(record['id'], [])
+
+    return [{name: record[name] for name in names} for record in records]
+
+
+def get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        abort(404)
+    return resource
+
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# Registered per code, the application's own 404/500 handlers render HTML
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return json_response({'error': error.description}, error.code)
+
+
+@api.route('/<resource_name>')
+def list_resource(resource_name):
+    resource = get_resource(resource_name)
+    names = selected_fields(resource)
+
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+
+    try:
+        page = keyset_page(
+            build_query(resource, names),
+            (resource['model'].id,),
+            cursor=request.args.get('cursor'),
+            direction=request.args.get('direction', 'next'),
+            per_page=limit,
+            descending=False
+        )
+    except ValueError as error:
+        abort(400, str(error))
+
+    def link(cursor, direction):
+        if cursor is None:
+            return None
+        return url_for('api.list_resource', resource_name=resource_name, cursor=cursor,
+                       direction=direction, limit=limit, fields=request.args.get('fields'))
+
+    return json_response({
+        'data': to_records(resource, names, page.items),
+        'next': link(page.next_cursor, 'next'),
+        'previous': link(page.prev_cursor, 'prev'),
+    })
+
+
+@api.route('/<resource_name>/<int:row_id>')
+def get_resource_item(resource_name, row_id):
+    resource = get_resource(resource_name)
+    names = selected_fields(resource)
+
+    row = build_query(resource, names).filter(resource['model'].id == row_id).first()
+    if row is None:
+        abort(404, 'Not found')
+
+    return json_response({'data': to_records(resource, names, [row])[0]})
+
+
+@api.route('/<resource_name>', methods=['DELETE'])
+def delete_resource(resource_name):
+    # Bulk delete: {"ids": [1, 2, 3]}, the shows of the deleted venues or
+    # artists are cascaded by the database
+    resource = get_resource(resource_name)
+    if resource['model'] not in deletes.OWNERS:
+        abort(400, 'Only venues and artists can be deleted')
+
+    payload = request.get_json(silent=True) or {}
+    ids = payload.get('ids') if isinstance(payload, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(row_id, int) for row_id in ids):
+        abort(400, 'Expected a JSON body like {"ids": [1, 2, 3]}')
+    if len(ids) > deletes.CHUNK_SIZE:
+        abort(400, 'At most {} ids per request'.format(deletes.CHUNK_SIZE))
+
+    return json_response({'deleted': deletes.delete_owners(resource['model'], ids)})
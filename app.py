@@ -3,31 +3,195 @@
 #----------------------------------------------------------------------------#
 
 import os
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
 import dateutil.parser
-import babel
-from flask import jsonify, render_template, request, flash, redirect, url_for
+from flask import abort, g, jsonify, render_template, request, flash, redirect, url_for
 import logging
 from logging import Formatter, FileHandler
 
 from sqlalchemy import desc
 from forms import *
 from models import *
+from conditional import conditional
+from pagination import keyset_page
+import counters
+import deletes
+import formatting
+import fragments
+import jobs
+import pool
+import search
+import typeahead
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+# The `datetime` filter, and ?locale= / ?tz= display settings per request
+formatting.init_app(app)
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def add_formatted_start_times(shows, format='full'):
+    # Listings format all their start times in one batch rather than with
+    # the filter row by row
+    start_times = formatting.format_many([show['start_time'] for show in shows], format)
+    for show, formatted in zip(shows, start_times):
+        show['formatted_start_time'] = formatted
+    return shows
+
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+
+def venue_page_tags(venue_id):
+    # Cached pages showing the venue: its own page, the listings, and the
+    # pages of the artists who play there
+    artist_ids = db.session.query(Show.artist_id).filter(
+        Show.venue_id == venue_id).distinct()
+    return ['venues', 'shows', 'venue:{}'.format(venue_id)] + [
+        'artist:{}'.format(artist_id) for artist_id, in artist_ids]
+
+
+def artist_page_tags(artist_id):
+    # Cached pages showing the artist: its own page, the listings, and the
+    # pages of the venues it plays at
+    venue_ids = db.session.query(Show.venue_id).filter(
+        Show.artist_id == artist_id).distinct()
+    return ['artists', 'shows', 'artist:{}'.format(artist_id)] + [
+        'venue:{}'.format(venue_id) for venue_id, in venue_ids]
+
+
+def defer_follow_up(table, row_id, paths):
+    # Work that need not hold up the response (search index, link check,
+    # re-rendering the invalidated pages), queued once the change and its
+    # cache invalidation are done
+    jobs.enqueue('reindex', table=table, ids=[row_id])
+    jobs.enqueue('check_links', table=table, id=row_id)
+    jobs.enqueue('warm_pages', paths=paths)
+    db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Page versions.
+#----------------------------------------------------------------------------#
+
+# Each returns what a page's content depends on, read in one statement, and
+# its last modification time. Used by @conditional to answer with a 304.
+
+
+def latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def venues_version():
+    updated_at, count = db.session.query(
+        db.func.max(Venue.updated_at), db.func.count(Venue.id)).one()
+    return (updated_at, count), updated_at
+
+
+def artists_version():
+    updated_at, count = db.session.query(
+        db.func.max(Artist.updated_at), db.func.count(Artist.id)).one()
+    return (updated_at, count), updated_at
+
+
+def shows_version():
+    shows_updated_at, count, venues_updated_at, artists_updated_at = db.session.query(
+        db.select(db.func.max(Show.updated_at)).scalar_subquery(),
+        db.select(db.func.count(Show.id)).scalar_subquery(),
+        db.select(db.func.max(Venue.updated_at)).scalar_subquery(),
+        db.select(db.func.max(Artist.updated_at)).scalar_subquery()
+    ).one()
+    return ((shows_updated_at, count, venues_updated_at, artists_updated_at),
+            latest(shows_updated_at, venues_updated_at, artists_updated_at))
+
+
+def detail_version(model, foreign_key, other, other_key, row_id):
+    # The row itself, its shows, the rows on the other side of those shows,
+    # how many of the shows are upcoming right now and when the last one
+    # started
+    current_time = datetime.now()
+    row = db.session.query(
+        model.updated_at,
+        db.func.max(Show.updated_at),
+        db.func.max(other.updated_at),
+        db.func.count(Show.id),
+        db.func.sum(db.case((Show.start_time > current_time, 1), else_=0)),
+        db.func.max(db.case((Show.start_time <= current_time, Show.start_time)))
+    ).outerjoin(Show, foreign_key == model.id).outerjoin(
+        other, other.id == other_key
+    ).filter(model.id == row_id).group_by(model.id, model.updated_at).first()
+
+    if row is None:
+        return None
+
+    # The page changed when that show moved from upcoming to past, so that
+    # If-Modified-Since alone does not get a 304 for the earlier page
+    last_started = row[5]
+    if last_started is not None:
+        last_started = last_started.replace(tzinfo=formatting.stored_timezone()).astimezone(
+            timezone.utc).replace(tzinfo=None)
+    return tuple(row), latest(*row[:3], last_started)
+
+
+def shows_stamp(version, row_id):
+    # What the show grids of a detail page depend on: its detail_version()
+    # but the row's own updated_at, so that editing the venue or artist
+    # keeps its cached grids. Taken from what @conditional read for the
+    # request, read again only when it did not (pages with flashed messages).
+    parts = g.get('page_version')
+    if parts is None:
+        parts = version(row_id)[0]
+    return parts[1:]
+
+
+def venue_version(venue_id):
+    return detail_version(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_version(artist_id):
+    return detail_version(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+#----------------------------------------------------------------------------#
+# Show filters.
+#----------------------------------------------------------------------------#
+
+# Longest range the calendar counts in one request
+CALENDAR_MAX_DAYS = 366
+
+
+def parse_time(value, end=False):
+    # A date or date and time from the query string. A plain date used as
+    # the end of a range includes that whole day.
+    moment = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def show_filters(args):
+    # (criteria, filters) for ?from=&to=&city=&state=: SQL criteria on shows
+    # joined to their venue, and the filters given, to carry over in links.
+    # `from` is inclusive, `to` exclusive. Raises ValueError on bad dates.
+    filters = {name: args[name] for name in ('from', 'to', 'city', 'state') if args.get(name)}
+
+    criteria = []
+    if 'from' in filters:
+        criteria.append(Show.start_time >= parse_time(filters['from']))
+    if 'to' in filters:
+        criteria.append(Show.start_time < parse_time(filters['to'], end=True))
+    if 'city' in filters:
+        criteria.append(Venue.city == filters['city'])
+    if 'state' in filters:
+        criteria.append(Venue.state == filters['state'])
+
+    return criteria, filters
 
 
 #----------------------------------------------------------------------------#
@@ -40,107 +204,136 @@ def index():
     return render_template('pages/home.html')
 
 
-#  Venues
+#  Suggestions
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-    # TODO: replace with real venues data.
-    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-    main_locations = Venue.query.distinct(Venue.city, Venue.state).all()
+@app.route('/search/suggest')
+def search_suggestions():
+    # Name suggestions for the search boxes as the user types, answered from
+    # an in-memory prefix index rather than the database
 
-    data = []
+    prefix = request.args.get('q', '')
+    kinds = request.args.getlist('type') or None
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
 
-    for venue in main_locations:
+    if kinds and not set(kinds) <= set(typeahead.MODELS):
+        abort(400)
 
-        venue_city = venue.city
-        venue_state = venue.state
-        venues = []
+    results = [{
+        'type': kind,
+        'id': row_id,
+        'name': name,
+        'url': '/{}s/{}'.format(kind, row_id)
+    } for kind, row_id, name in typeahead.suggest(prefix, kinds, limit)]
 
-        venue_data = Venue.query.filter(
-            Venue.city == venue_city,
-            Venue.state == venue_state
-        ).all()
+    return jsonify({'query': prefix, 'results': results})
 
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-        for this_venue in venue_data:
-            venue_id = this_venue.id
-            venue_name = this_venue.name
-            num_upcoming_shows = Show.query.filter(Show.start_time > current_time).filter(
-                Show.venue_id == this_venue.id).count()
+#  Venues
+#  ----------------------------------------------------------------
 
-            # Append the needed data to venues array
-            venues.append({
-                'id': venue_id,
-                'name': venue_name,
-                'num_upcoming_shows': num_upcoming_shows
-            })
+@app.route('/venues')
+@conditional(venues_version)
+@response_cache.cached('venues')
+def venues():
+    # One statement: every venue with its upcoming show counter, ordered so
+    # that venues of the same city/state come out together. ?genre= keeps the
+    # venues of one genre through the genre link index.
+    genre = request.args.get('genre')
+    venue_rows = with_genre(db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count
+    ), Venue, genre).order_by(
+        Venue.state, Venue.city, Venue.id
+    ).all()
 
-        # Append the venue data to the data array
+    data = []
+
+    # Fold the rows into the areas structure the template expects
+    for (venue_city, venue_state), rows in groupby(venue_rows, key=lambda row: (row[0], row[1])):
         data.append({
             'city': venue_city,
             'state': venue_state,
-            'venues': venues  # list of venues
+            'venues': [{
+                'id': venue_id,
+                'name': venue_name,
+                'num_upcoming_shows': num_upcoming_shows
+            } for _, _, venue_id, venue_name, num_upcoming_shows in rows]
         })
 
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=data, genre=genre,
+                           genre_counts=genre_counts(Venue))
 
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for Hop should return "The Musical Hop".
-    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    # Ranked search across name, city, state and genres, e.g. "hop" returns
+    # "The Musical Hop" and "music" also matches "Park Square Live Music & Coffee".
+    # Word prefixes rank first, then names containing the term: "usic".
 
-    search_term = request.form['search_term']
+    search_term = request.values.get('search_term', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
 
-    related_venues = Venue.query.filter(
-        db.func.lower(Venue.name).like("%{}%".format(search_term.lower()))).order_by('name').all()
+    related_venues, total = search.search(
+        Venue, search_term, limit=per_page, offset=(page - 1) * per_page)
 
     response = {
-        'count': len(related_venues),
+        'count': total,
         'data': related_venues
     }
 
-    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                           page=page, has_next=page * per_page < total)
 
 
 @app.route('/venues/<int:venue_id>')
+@conditional(venue_version)
+@response_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
 
     # TODO: Get the PAST and the UPCOMING shows and append it to the data
 
-    data = Venue.query.get(venue_id)
-    shows = Show.query.filter_by(venue_id=venue_id).all()
+    data = Venue.query.get_or_404(venue_id)
 
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+    def load_shows():
+        # Only called when the show grids are not in the fragment cache
+        current_time = datetime.now()
 
-    past_shows = []
-    upcoming_shows = []
+        # Shows joined to their artist in the same statement, split in SQL
+        venue_shows = db.session.query(
+            Show.artist_id,
+            Artist.name,
+            Artist.image_link,
+            Show.start_time
+        ).join(Artist, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id)
 
-    for show in shows:
-        show_info = {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": str(show.start_time)
-        }
+        upcoming_shows = [{
+            "artist_id": artist_id,
+            "artist_name": artist_name,
+            "artist_image_link": artist_image_link,
+            "start_time": start_time
+        } for artist_id, artist_name, artist_image_link, start_time in venue_shows.filter(
+            Show.start_time > current_time).order_by(Show.start_time, Show.id)]
 
-        if str(show.start_time) > current_time:
-            upcoming_shows.append(show_info)
-        else:
-            past_shows.append(show_info)
+        past_shows = [{
+            "artist_id": artist_id,
+            "artist_name": artist_name,
+            "artist_image_link": artist_image_link,
+            "start_time": start_time
+        } for artist_id, artist_name, artist_image_link, start_time in venue_shows.filter(
+            Show.start_time <= current_time).order_by(desc(Show.start_time), desc(Show.id))]
 
-    # Appending the show info to the data dictionary
-    data.past_shows = past_shows
-    data.upcoming_shows = upcoming_shows
-    data.past_shows_count = len(past_shows)
-    data.upcoming_shows_count = len(upcoming_shows)
+        return add_formatted_start_times(upcoming_shows), add_formatted_start_times(past_shows)
 
-    return render_template('pages/show_venue.html', venue=data)
+    # The show counts are read from the counter columns
+    return render_template('pages/show_venue.html', venue=data, load_shows=load_shows,
+                           shows_stamp=shows_stamp(venue_version, venue_id))
 
 
 #  Create Venue
@@ -177,7 +370,7 @@ def create_venue_submission():
             address=address,
             phone=phone,
             image_link=image_link,
-            genres=genres,
+            genres=Genre.named(genres),
             facebook_link=facebook_link,
             website=website,
             seeking_talent=seeking_talent,
@@ -187,9 +380,6 @@ def create_venue_submission():
         db.session.add(new_venue)
         db.session.commit()
 
-        # on successful db insert, flash success
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-
     except:
         # TODO: on unsuccessful db insert, flash an error instead.
         flash('An error occurred. Venue ' + name + ' could not be listed.')
@@ -197,6 +387,15 @@ def create_venue_submission():
 
         db.session.rollback()
 
+    else:
+        with jobs.follow_up('venue {}'.format(new_venue.id)):
+            typeahead.add('venue', new_venue.id, name)
+            response_cache.invalidate('venues')
+            defer_follow_up('venues', new_venue.id, ['/venues'])
+
+        # on successful db insert, flash success
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+
     finally:
         db.session.close()
 
@@ -214,22 +413,14 @@ def delete_venue(venue_id):
     deletion_status = False
 
     try:
-        venue = Venue.query.get(venue_id)
-        shows = Show.query.filter_by(venue_id=venue_id).all()
+        # The shows go with the venue through ON DELETE CASCADE
+        deletion_status = deletes.delete_owners(Venue, [venue_id]) > 0
 
-        for show in shows:
-            db.session.delete(show)
-
-        db.session.delete(venue)
-        db.session.commit()
-
-        deletion_status = True
-
-        flash("Venue deleted successfully.")
+        if deletion_status:
+            flash("Venue deleted successfully.")
 
     except:
         deletion_status = False
-        db.session.rollback()
 
     finally:
         db.session.close()
@@ -240,11 +431,14 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 @app.route('/artists')
+@conditional(artists_version)
+@response_cache.cached('artists')
 def artists():
     # TODO: replace with real data returned from querying the database
     data = []
 
-    artists = Artist.query.order_by(desc('id')).all()
+    genre = request.args.get('genre')
+    artists = with_genre(Artist.query, Artist, genre).order_by(desc(Artist.id)).all()
 
     for artist in artists:
         # Append the needed information to the data list for each artist
@@ -253,61 +447,93 @@ def artists():
             'name': artist.name,
         })
 
-    return render_template('pages/artists.html', artists=data)
+    return render_template('pages/artists.html', artists=data, genre=genre,
+                           genre_counts=genre_counts(Artist))
 
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-    # search for "band" should return "The Wild Sax Band".
+    # Ranked search across name, city, state and genres, e.g. "a" returns
+    # "Guns N Petals", "Matt Quevado" and "The Wild Sax Band": word prefixes
+    # rank first, then names containing the term
 
-    search_term = request.form['search_term']
+    search_term = request.values.get('search_term', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
 
-    related_artists = Artist.query.filter(
-        db.func.lower(Artist.name).like("%{}%".format(search_term.lower()))).order_by('name').all()
+    related_artists, total = search.search(
+        Artist, search_term, limit=per_page, offset=(page - 1) * per_page)
 
     response = {
-        'count': len(related_artists),
+        'count': total,
         'data': related_artists
     }
 
-    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                           page=page, has_next=page * per_page < total)
 
 
 @app.route('/artists/<int:artist_id>')
+@conditional(artist_version)
+@response_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     # TODO: replace with real artist data from the artist table, using artist_id
 
-    data = Artist.query.get(artist_id)
-    shows = Show.query.filter_by(artist_id=artist_id).all()
-
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-    past_shows = []
-    upcoming_shows = []
+    data = Artist.query.get_or_404(artist_id)
+
+    def load_shows():
+        # Only called when the show grids are not in the fragment cache
+        current_time = datetime.now()
+
+        # Shows joined to their venue in the same statement, split in SQL
+        artist_shows = db.session.query(
+            Show.venue_id,
+            Venue.name,
+            Venue.image_link,
+            Show.start_time
+        ).join(Venue, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id)
+
+        upcoming_shows = [{
+            "venue_id": venue_id,
+            "venue_name": venue_name,
+            "venue_image_link": venue_image_link,
+            "start_time": start_time
+        } for venue_id, venue_name, venue_image_link, start_time in artist_shows.filter(
+            Show.start_time > current_time).order_by(Show.start_time, Show.id)]
+
+        past_shows = [{
+            "venue_id": venue_id,
+            "venue_name": venue_name,
+            "venue_image_link": venue_image_link,
+            "start_time": start_time
+        } for venue_id, venue_name, venue_image_link, start_time in artist_shows.filter(
+            Show.start_time <= current_time).order_by(desc(Show.start_time), desc(Show.id))]
+
+        return add_formatted_start_times(upcoming_shows), add_formatted_start_times(past_shows)
+
+    # The show counts are read from the counter columns
+    return render_template('pages/show_artist.html', artist=data, load_shows=load_shows,
+                           shows_stamp=shows_stamp(artist_version, artist_id))
+
+
+@app.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    deletion_status = False
 
-    for show in shows:
-        show_info = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
-            "start_time": str(show.start_time)
-        }
+    try:
+        # The shows go with the artist through ON DELETE CASCADE
+        deletion_status = deletes.delete_owners(Artist, [artist_id]) > 0
 
-        if str(show.start_time) > current_time:
-            upcoming_shows.append(show_info)
-        else:
-            past_shows.append(show_info)
+        if deletion_status:
+            flash("Artist deleted successfully.")
 
-    # Appending the show info to the data dictionary
-    data.past_shows = past_shows
-    data.upcoming_shows = upcoming_shows
-    data.past_shows_count = len(past_shows)
-    data.upcoming_shows_count = len(upcoming_shows)
+    except:
+        deletion_status = False
 
-    return render_template('pages/show_artist.html', artist=data)
+    finally:
+        db.session.close()
+        return jsonify({'status': deletion_status})
 
 
 #  Update
@@ -317,9 +543,11 @@ def show_artist(artist_id):
 def edit_artist(artist_id):
 
     # Fetch the actual artist to edit and convert it to a dictionary object
-    artist = Artist.query.get(artist_id).__dict__
+    row = Artist.query.get(artist_id)
+    artist = row.__dict__
 
     artist['website_link'] = artist['website']
+    artist['genres'] = [genre.name for genre in row.genres]
 
     # TODO: populate form with fields from artist with ID <artist_id>
     form = ArtistForm(**artist)
@@ -340,19 +568,28 @@ def edit_artist_submission(artist_id):
         artist.state = request.form['state']
         artist.phone = request.form['phone']
         artist.image_link = request.form['image_link']
-        artist.genres = request.form.getlist('genres', type=str)
+        artist.genres = Genre.named(request.form.getlist('genres', type=str))
         artist.facebook_link = request.form['facebook_link']
         artist.website = request.form['website_link']
         artist.seeking_venue = 'seeking_venue' in request.form
         artist.seeking_description = request.form['seeking_description']
+        # Genre links live in their own table, touch the row so that its
+        # page version changes even when only the genres did
+        artist.updated_at = datetime.utcnow()
 
         db.session.commit()
 
-        flash('Changes saved successfully')
-
     except:
         db.session.rollback()
 
+    else:
+        with jobs.follow_up('artist {}'.format(artist_id)):
+            typeahead.add('artist', artist_id, request.form['name'])
+            response_cache.invalidate(*artist_page_tags(artist_id))
+            defer_follow_up('artists', artist_id, ['/artists/{}'.format(artist_id), '/artists'])
+
+        flash('Changes saved successfully')
+
     finally:
         db.session.close()
 
@@ -363,9 +600,11 @@ def edit_artist_submission(artist_id):
 def edit_venue(venue_id):
 
     # Fetch the actual venue to edit and convert it to a dictionary
-    venue = Venue.query.get(venue_id).__dict__
+    row = Venue.query.get(venue_id)
+    venue = row.__dict__
 
     venue['website_link'] = venue['website']
+    venue['genres'] = [genre.name for genre in row.genres]
 
     # TODO: populate form with values from venue with ID <venue_id>
     form = VenueForm(**venue)
@@ -387,19 +626,28 @@ def edit_venue_submission(venue_id):
         venue.address = request.form['address']
         venue.phone = request.form['phone']
         venue.image_link = request.form['image_link']
-        venue.genres = request.form.getlist('genres', type=str)
+        venue.genres = Genre.named(request.form.getlist('genres', type=str))
         venue.facebook_link = request.form['facebook_link']
         venue.website = request.form['website_link']
         venue.seeking_talent = 'seeking_talent' in request.form
         venue.seeking_description = request.form['seeking_description']
+        # Genre links live in their own table, touch the row so that its
+        # page version changes even when only the genres did
+        venue.updated_at = datetime.utcnow()
 
         db.session.commit()
 
-        flash('Changes saved successfully')
-
     except:
         db.session.rollback()
 
+    else:
+        with jobs.follow_up('venue {}'.format(venue_id)):
+            typeahead.add('venue', venue_id, request.form['name'])
+            response_cache.invalidate(*venue_page_tags(venue_id))
+            defer_follow_up('venues', venue_id, ['/venues/{}'.format(venue_id), '/venues'])
+
+        flash('Changes saved successfully')
+
     finally:
         db.session.close()
 
@@ -439,7 +687,7 @@ def create_artist_submission():
             state=state,
             phone=phone,
             image_link=image_link,
-            genres=genres,
+            genres=Genre.named(genres),
             facebook_link=facebook_link,
             website=website,
             seeking_venue=seeking_venue,
@@ -449,13 +697,19 @@ def create_artist_submission():
         db.session.add(new_artist)
         db.session.commit()
 
-        # on successful db insert, flash success
-        flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except:
         # TODO: on unsuccessful db insert, flash an error instead.
         flash('An error occurred. Artist ' + name +
               ' could not be listed.', 'alert-danger')
         db.session.rollback()
+    else:
+        with jobs.follow_up('artist {}'.format(new_artist.id)):
+            typeahead.add('artist', new_artist.id, name)
+            response_cache.invalidate('artists')
+            defer_follow_up('artists', new_artist.id, ['/artists'])
+
+        # on successful db insert, flash success
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
 
     finally:
         db.session.close()
@@ -467,34 +721,112 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@conditional(shows_version)
+@response_cache.cached('shows')
 def shows():
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
-
-    try:
-        shows = Show.query.order_by(desc('start_time')).all()
+    # displays one page of shows at /shows, most recent first, optionally
+    # between two dates (?from=2026-10-01&to=2026-10-31) and in one place
+    # (?city=&state=), a range scan on the start time index
 
-        data = []
+    cursor = request.args.get('cursor')
+    direction = request.args.get('direction', 'next')
 
-        for show in shows:
-            venue_data = Venue.query.get(show.venue_id)
-            artist_data = Artist.query.get(show.artist_id)
+    data = []
+    filters = {}
+    next_cursor = prev_cursor = None
 
-            show_info = {
-                "venue_id": show.venue_id,
-                "venue_name": venue_data.name,
-                "artist_id": show.artist_id,
-                "artist_name": artist_data.name,
-                "artist_image_link": artist_data.image_link,
-                "start_time": str(show.start_time),
-            }
+    try:
+        criteria, filters = show_filters(request.args)
+
+        # Venue and artist details come from the same statement as the show
+        shows_query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link')
+        ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).filter(
+            *criteria)
+
+        page = keyset_page(
+            shows_query,
+            (Show.start_time, Show.id),
+            cursor=cursor,
+            direction=direction,
+            per_page=app.config['SHOWS_PER_PAGE']
+        )
+    except ValueError:
+        abort(400)
 
-            data.append(show_info)
     except:
         flash("Error in fetching the list of shows", 'alert-danger')
 
-    finally:
-        return render_template('pages/shows.html', shows=data)
+    else:
+        for show in page.items:
+            data.append({
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time,
+            })
+        add_formatted_start_times(data)
+
+        next_cursor = page.next_cursor
+        prev_cursor = page.prev_cursor
+
+    return render_template('pages/shows.html', shows=data, filters=filters,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+@app.route('/shows/calendar')
+@conditional(shows_version)
+@response_cache.cached('shows')
+def shows_calendar():
+    # Number of shows per day, for a month (?month=2026-10, the current one
+    # by default) or a ?from=&to= range, with the same city/state filters as
+    # /shows. One grouped statement over the start time index.
+    args = request.args.to_dict()
+    if not (args.get('from') or args.get('to')):
+        if not args.get('month'):
+            # The page is cached and validated by its URL, which must name
+            # the month: it would stay on the old one once the month changes
+            args['month'] = datetime.now().strftime('%Y-%m')
+            return redirect(url_for('shows_calendar', **args))
+        try:
+            month = datetime.strptime(args['month'], '%Y-%m')
+        except ValueError:
+            abort(400)
+        args['from'] = month.strftime('%Y-%m-%d')
+        args['to'] = ((month + timedelta(days=31)).replace(day=1) - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    try:
+        criteria, filters = show_filters(args)
+        first_day = parse_time(filters['from']).date()
+        last_day = (parse_time(filters['to'], end=True) - timedelta(microseconds=1)).date()
+    except (KeyError, ValueError):
+        abort(400)
+
+    if not 0 <= (last_day - first_day).days < CALENDAR_MAX_DAYS:
+        abort(400)
+
+    day = db.func.date(Show.start_time)
+    query = db.session.query(day, db.func.count(Show.id))
+    if 'city' in filters or 'state' in filters:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    counts = {str(show_day): count for show_day, count in query.filter(*criteria).group_by(day)}
+
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    return jsonify({
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'total': sum(counts.values()),
+        'days': [{'date': show_day.isoformat(), 'count': counts.get(show_day.isoformat(), 0)}
+                 for show_day in days],
+    })
 
 
 @app.route('/shows/create')
@@ -510,13 +842,13 @@ def create_show_submission():
     # TODO: insert form data as a new Show record in the db, instead
 
     try:
-        artist_id = request.form['artist_id']
-        venue_id = request.form['venue_id']
-        start_time = request.form['start_time']
-
         is_artist_id_valid = True
         is_venue_id_valid = True
 
+        artist_id = request.form['artist_id']
+        venue_id = request.form['venue_id']
+        start_time = dateutil.parser.parse(request.form['start_time'])
+
         if Artist.query.filter(Artist.id == artist_id).count() == 0:
             is_artist_id_valid = False
             raise
@@ -533,10 +865,9 @@ def create_show_submission():
         )
 
         db.session.add(new_show)
+        counters.record_show_added(new_show)
         db.session.commit()
 
-        # on successful db insert, flash success
-        flash('Show was successfully listed!')
     except:
         db.session.rollback()
 
@@ -546,12 +877,52 @@ def create_show_submission():
             flash('Venue ID not found', 'alert-danger')
         else:
             flash('An error occurred. Show could not be listed.', 'alert-danger')
+    else:
+        with jobs.follow_up('show {}'.format(new_show.id)):
+            response_cache.invalidate(
+                'shows', 'venues', 'venue:{}'.format(venue_id), 'artist:{}'.format(artist_id))
+            jobs.enqueue('warm_pages', paths=[
+                '/shows', '/venues/{}'.format(venue_id), '/artists/{}'.format(artist_id)])
+            db.session.commit()
+
+        # on successful db insert, flash success
+        flash('Show was successfully listed!')
     finally:
         db.session.close()
 
     return render_template('pages/home.html')
 
 
+#  Stats
+#  ----------------------------------------------------------------
+
+@app.route('/_stats/cache')
+def cache_stats():
+    return jsonify(dict(response_cache.stats(), fragments=fragments.get_fragment_cache().stats()))
+
+
+@app.route('/_stats/pool')
+def pool_stats():
+    return jsonify(pool.pool_stats(db.engine))
+
+
+@app.route('/_stats/jobs')
+def job_stats():
+    # Queue depth from the jobs table, latencies from this process's runner
+    stats = jobs.queue_stats()
+    runner = app.extensions.get('jobs')
+    stats['runner'] = runner.stats() if runner is not None else None
+    return jsonify(stats)
+
+
+@app.route('/_debug/sql')
+def debug_sql():
+    # Statement counts and repeated statements of the last requests
+    if not (app.debug or app.testing):
+        abort(404)
+    return render_template('pages/debug_sql.html', requests=sql_instrumentation.requests())
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -573,6 +944,32 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+# Flask CLI commands (flask counters ...)
+import commands
+
+# Versioned JSON read API at /api/v1
+from api import api
+app.register_blueprint(api)
+
+# Streaming CSV / JSON Lines dumps at /export
+from export import export
+app.register_blueprint(export)
+
+# gzip / brotli compression of the dynamic responses
+import compression
+compression.init_app(app)
+
+# Fingerprinted, precompressed bundles built by `flask assets build`
+import assets
+assets.init_app(app)
+
+# Resized local copies of the venue and artist images at /thumbnails
+import thumbnails
+thumbnails.init_app(app)
+
+# {% cache %} template fragments and the on-disk template bytecode cache
+fragments.init_app(app)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -0,0 +1,222 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, .gz siblings only
+    brotli = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # pragma: no cover - optional, built-in CSS minifier
+    rcssmin = rjsmin = None
+
+
+#----------------------------------------------------------------------------#
+# Bundles.
+#----------------------------------------------------------------------------#
+
+# Bundle name -> source files under static/, concatenated in this order
+BUNDLES = {
+    'app.css': (
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ),
+    # Run in <head>, before the page is parsed
+    'head.js': (
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ),
+    # Deferred, after jQuery
+    'app.js': (
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/deleteBtnTrigger.js',
+        'js/typeahead.js',
+    ),
+}
+
+# Files fingerprinted on their own
+FILES = (
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/respond-1.4.2.min.js',
+)
+
+# Built files go to static/dist, one directory below the sources so that
+# relative url(../fonts/...) references keep working
+OUTPUT_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# Fingerprinted names never change content
+MAX_AGE = 365 * 24 * 3600
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    # Comments (but /*! licenses), then whitespace
+    text = re.sub(r'/\*(?!!).*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Without rjsmin the (mostly already minified) scripts are only
+    # concatenated, a home-made JS minifier is not worth the risk
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text.strip()
+
+
+def read_sources(static_folder, names):
+    texts = []
+    for name in names:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as source:
+            texts.append(source.read())
+    return texts
+
+
+def fingerprinted(name, data):
+    # app.css -> app.3f2a9c41d0e7.css
+    stem, extension = os.path.splitext(name)
+    return '{}.{}{}'.format(stem, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+def write_compressed(path, data):
+    # The file and its precompressed siblings, each written only if missing
+    outputs = [(path, lambda: data), (path + '.gz', lambda: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        outputs.append((path + '.br', lambda: brotli.compress(data, quality=11)))
+
+    for output_path, compress in outputs:
+        if not os.path.exists(output_path):
+            with open(output_path, 'wb') as output:
+                output.write(compress())
+
+
+def build(static_folder, report=print):
+    # Writes the bundles and files under their content hash, with .gz (and
+    # .br) siblings, and the manifest mapping names to them. Files of
+    # earlier builds are removed.
+    output_dir = os.path.join(static_folder, OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    outputs = {}
+    for name, sources in BUNDLES.items():
+        texts = read_sources(static_folder, sources)
+        if name.endswith('.css'):
+            data = minify_css('\n'.join(texts))
+        else:
+            # A statement ending without ';' must not run into the next file
+            data = '\n;\n'.join(minify_js(text) for text in texts)
+        outputs[name] = data.encode('utf-8')
+    for name in FILES:
+        with open(os.path.join(static_folder, name), 'rb') as source:
+            outputs[name] = source.read()
+
+    manifest = {}
+    for name, data in outputs.items():
+        built = fingerprinted(os.path.basename(name), data)
+        write_compressed(os.path.join(output_dir, built), data)
+        manifest[name] = '{}/{}'.format(OUTPUT_DIR, built)
+        report('{:<40} {:>8} bytes -> {}'.format(name, len(data), manifest[name]))
+
+    with open(os.path.join(output_dir, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+    current = {os.path.basename(path) for path in manifest.values()} | {MANIFEST}
+    for file_name in os.listdir(output_dir):
+        base = re.sub(r'\.(gz|br)$', '', file_name)
+        if base not in current:
+            os.remove(os.path.join(output_dir, file_name))
+
+    return manifest
+
+
+#----------------------------------------------------------------------------#
+# Templates.
+#----------------------------------------------------------------------------#
+
+
+def load_manifest(app):
+    # Read once per process, and again when a new build replaced it
+    path = os.path.join(app.static_folder, OUTPUT_DIR, MANIFEST)
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    cached = app.extensions.get('assets')
+    if cached is None or cached[0] != modified:
+        with open(path) as manifest_file:
+            cached = app.extensions['assets'] = (modified, json.load(manifest_file))
+    return cached[1]
+
+
+def asset_urls(name):
+    # URLs to include for a bundle or file: the built one, or its sources
+    # when `flask assets build` has not been run
+    built = load_manifest(current_app).get(name)
+    if built is not None:
+        return [url_for('static', filename=built)]
+    return [url_for('static', filename=source) for source in BUNDLES.get(name, (name,))]
+
+
+def asset_url(name):
+    urls = asset_urls(name)
+    if len(urls) != 1:
+        raise ValueError('{} is a bundle of {} files, use asset_urls()'.format(name, len(urls)))
+    return urls[0]
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+# Content-Encoding -> sibling suffix, preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def send_built_asset(filename):
+    # Built files with their precompressed sibling when the client takes it,
+    # cached for a year as they never change under a given name
+    directory = os.path.join(current_app.static_folder, OUTPUT_DIR)
+    if filename == MANIFEST or filename.endswith(('.gz', '.br')):
+        abort(404)
+
+    encoding, path = None, filename
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.exists(os.path.join(directory, filename + suffix)):
+            encoding, path = name, filename + suffix
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(directory, path, mimetype=mimetype, max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    # More specific than /static/<path:filename>, so it takes precedence
+    app.add_url_rule('{}/{}/<path:filename>'.format(app.static_url_path, OUTPUT_DIR),
+                     'built_asset', send_built_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+# Seeds a scratch database at several sizes, requests every GET route of the
+# app through the Flask test client and writes latency percentiles and SQL
+# statement counts per route to a JSON report. With --baseline the report is
+# compared against a stored one and the run fails on regressions.
+#
+#   BENCHMARK_DATABASE_URL=postgresql://localhost/fyyur_bench \
+#       python benchmark.py --scales 1000,10000,100000 --output report.json
+#   python benchmark.py --scales 1000 --baseline report.json
+#
+# The database is dropped and recreated, never point it at real data.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+# Placeholder values of the URL arguments of the routes
+SAMPLE_ARGS = {
+    'resource_name': ('venues', 'artists', 'shows'),
+    'format': ('csv', 'jsonl'),
+}
+
+# Routes with query strings worth measuring on top of the bare URLs
+EXTRA_URLS = (
+    '/venues/search?search_term=the',
+    '/artists/search?search_term=a',
+    '/search/suggest?q=th',
+    '/api/v1/shows?limit=200',
+    # The shows are seeded around today, see seed_database()
+    '/shows/calendar?month={this_month}',
+)
+
+# (encoding, level) pairs compared by --compression
+COMPRESSION_SETTINGS = (('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 11))
+
+# Never benchmarked: static files, the debug pages, the image proxy, which
+# downloads from the image hosts, and the bare calendar, only a redirect to
+# the current month (in EXTRA_URLS)
+SKIPPED_ENDPOINTS = ('static', 'built_asset', 'debug_sql', 'thumbnails.thumbnail', 'shows_calendar')
+
+
+#----------------------------------------------------------------------------#
+# Seeding.
+#----------------------------------------------------------------------------#
+
+
+def seed_database(shows, seed_value=0):
+    # One venue per ten shows and twice as many artists, from `flask seed`,
+    # dated around today
+    from models import db
+    import seed
+
+    db.drop_all()
+    db.create_all()
+    seed.generate(venues=max(shows // 10, 1), artists=max(shows // 5, 1), shows=shows,
+                  seed=seed_value, report=lambda message: None)
+
+
+#----------------------------------------------------------------------------#
+# Measuring.
+#----------------------------------------------------------------------------#
+
+
+def route_urls(app, rng, owners):
+    # One URL per GET route, URL arguments filled with sample values
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+
+        variants = [{}]
+        for argument in rule.arguments:
+            values = SAMPLE_ARGS.get(argument) or (rng.randint(1, owners),)
+            variants = [dict(variant, **{argument: value})
+                        for variant in variants for value in values]
+
+        for variant in variants:
+            # Some combinations are no route at all (e.g. /export/shows.json)
+            url = rule.build(variant, append_unknown=False)
+            if url is not None:
+                urls.append(url[1])
+
+    this_month = datetime.now().strftime('%Y-%m')
+    return urls + [url.format(this_month=this_month) for url in EXTRA_URLS]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def measure(client, url, runs):
+    # One warm-up request, then `runs` timed ones
+    client.get(url).close()
+    timings, queries, status = [], 0, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(url)
+        # Streamed responses (exports) only produce their body as it is read
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        status = response.status_code
+        queries = max(queries, int(response.headers.get('X-SQL-Queries', 0)))
+        response.close()
+
+    return {
+        'status': status,
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def measure_compression(app, client, url, runs):
+    # Size and CPU time of each compression setting on the route's body.
+    # The test client sends no Accept-Encoding, so the body is the raw one.
+    import compression
+
+    response = client.get(url)
+    body = response.get_data()
+    mimetype = response.mimetype
+    response.close()
+    if mimetype not in app.config['COMPRESS_MIMETYPES'] or not body:
+        return None
+
+    settings = {'bytes': len(body)}
+    for encoding, level in COMPRESSION_SETTINGS:
+        if encoding not in compression.ENCODINGS:
+            continue
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            compressed = compression.compress(body, encoding, level)
+            timings.append((time.perf_counter() - started) * 1000)
+        settings['{}-{}'.format(encoding, level)] = {
+            'bytes': len(compressed),
+            'saved': round(1 - len(compressed) / len(body), 4),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+        }
+    return settings
+
+
+def run(app, scales, runs, with_compression=False):
+    from models import db
+
+    results, compressed = {}, {}
+    for shows in scales:
+        with app.app_context():
+            started = time.perf_counter()
+            seed_database(shows)
+            print('Seeded {} shows in {:.1f}s'.format(shows, time.perf_counter() - started))
+
+        client = app.test_client()
+        rng = random.Random(shows)
+        scale = results[str(shows)] = {}
+        for url in route_urls(app, rng, max(shows // 10, 1)):
+            scale[url] = measure(client, url, runs)
+            print('  {:<45} {status} {queries:>3} queries  p50 {p50_ms:>8} ms  '
+                  'p95 {p95_ms:>8} ms'.format(url, **scale[url]))
+            if with_compression:
+                settings = measure_compression(app, client, url, runs)
+                if settings is not None:
+                    compressed.setdefault(str(shows), {})[url] = settings
+                    print('    {:>9} bytes  '.format(settings['bytes']) + '  '.join(
+                        '{} {:.0%} {}ms'.format(name, value['saved'], value['p50_ms'])
+                        for name, value in settings.items() if name != 'bytes'))
+
+        with app.app_context():
+            db.session.remove()
+
+    return results, compressed
+
+
+#----------------------------------------------------------------------------#
+# Comparing.
+#----------------------------------------------------------------------------#
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    # Regressions of `report` against `baseline`: more SQL statements, or a
+    # p95 slower by more than `tolerance` and `min_delta_ms` (timer noise)
+    regressions = []
+    for scale, routes in baseline['results'].items():
+        for url, before in routes.items():
+            after = report['results'].get(scale, {}).get(url)
+            if after is None:
+                continue
+            if after['queries'] > before['queries']:
+                regressions.append('{} shows {}: {} queries, was {}'.format(
+                    scale, url, after['queries'], before['queries']))
+            slower = after['p95_ms'] - before['p95_ms']
+            if slower > min_delta_ms and after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append('{} shows {}: p95 {} ms, was {} ms'.format(
+                    scale, url, after['p95_ms'], before['p95_ms']))
+    return regressions
+
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every GET route of the app.')
+    parser.add_argument('--database-url', default=os.environ.get('BENCHMARK_DATABASE_URL'),
+                        help='Scratch database, dropped and reseeded (default: $BENCHMARK_DATABASE_URL).')
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='Comma separated numbers of shows to seed.')
+    parser.add_argument('--runs', type=int, default=20, help='Timed requests per route.')
+    parser.add_argument('--output', default='benchmark-report.json', help='Report to write.')
+    parser.add_argument('--baseline', help='Report to compare against, fails on regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p95 slowdown against the baseline, as a fraction.')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='p95 slowdowns smaller than this are never regressions.')
+    parser.add_argument('--cache', action='store_true',
+                        help='Keep the rendered page cache on (off by default).')
+    parser.add_argument('--compression', action='store_true',
+                        help='Also report bytes saved and CPU time per compression level.')
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error('a scratch database is required: --database-url or $BENCHMARK_DATABASE_URL')
+
+    # config.py reads these when the app is imported
+    os.environ['DATABASE_URL'] = args.database_url
+    if not args.cache:
+        os.environ['CACHE_TYPE'] = 'null'
+    from app import app
+
+    results, compressed = run(app, [int(scale) for scale in args.scales.split(',')], args.runs,
+                              with_compression=args.compression)
+    report = {
+        'created': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'runs': args.runs,
+        'results': results,
+    }
+    if args.compression:
+        report['compression'] = compressed
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print('Report written to {}'.format(args.output))
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(report, json.load(baseline), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+        print('No regressions against {}'.format(args.baseline))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, make_response, request, session
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class NullBackend:
+    # Caches nothing, used to switch caching off
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class LRUBackend:
+    # In-process cache bounded in entries, least recently used evicted first.
+    # A timeout of 0 never expires.
+
+    def __init__(self, max_entries=1000, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires, value)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self.lock:
+            self.entries[key] = (time.time() + timeout if timeout else 0, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FileSystemBackend:
+    # One pickle file per key in a directory shared by every worker process.
+    # A timeout of 0 never expires.
+
+    def __init__(self, directory, max_entries=10000, default_timeout=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as cache_file:
+                expires, value = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        # Write to a temporary file and rename, readers never see half a file
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as cache_file:
+            pickle.dump((time.time() + timeout if timeout else 0, value), cache_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+        self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        # Drop the oldest files once the directory grows past max_entries
+        names = os.listdir(self.directory)
+        if len(names) <= self.max_entries:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names),
+                       key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(os.listdir(self.directory))
+
+
+def create_backend(config):
+    cache_type = config['CACHE_TYPE']
+    if cache_type == 'lru':
+        return LRUBackend(config['CACHE_MAX_ENTRIES'], config['CACHE_DEFAULT_TIMEOUT'])
+    if cache_type == 'filesystem':
+        return FileSystemBackend(config['CACHE_DIR'], config['CACHE_MAX_ENTRIES'],
+                                 config['CACHE_DEFAULT_TIMEOUT'])
+    if cache_type == 'null':
+        return NullBackend()
+    raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+
+class ResponseCache:
+    # Caches rendered GET responses keyed by path and query string. Every
+    # entry is tagged (e.g. 'venue:1') and invalidate() drops all the entries
+    # of a tag by giving it a new token, so it works across worker processes
+    # when the backend is shared.
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        app.extensions['response_cache'] = self
+
+    def _tag_token(self, tag):
+        token = self.backend.get('tag:' + tag)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set('tag:' + tag, token, timeout=0)
+        return token
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set('tag:' + tag, uuid.uuid4().hex, timeout=0)
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def cached(self, *tags):
+        # View decorator. Tags may use the view arguments: 'venue:{venue_id}'
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pages carrying flashed messages are personal, never cache them
+                if request.method != 'GET' or '_flashes' in session:
+                    return view(*args, **kwargs)
+
+                key = 'view:' + request.full_path
+                # With the version @conditional computed for the page, so
+                # that a body is never served under another version's ETag
+                if 'page_etag' in g:
+                    key += '#' + g.page_etag
+                # Read the tokens before rendering, an invalidation that
+                # happens meanwhile then makes this entry stale right away
+                tokens = [self._tag_token(tag.format(**kwargs)) for tag in tags]
+
+                entry = self.backend.get(key)
+                if entry is not None and entry[0] == tokens:
+                    self._count(hit=True)
+                    return Response(entry[1], mimetype=entry[2])
+
+                self._count(hit=False)
+                response = make_response(view(*args, **kwargs))
+                if (response.status_code == 200 and not response.is_streamed
+                        and '_flashes' not in session):
+                    self.backend.set(key, (tokens, response.get_data(), response.mimetype))
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
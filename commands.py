@@ -0,0 +1,151 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from urllib.request import urlopen
+
+import click
+from flask.cli import AppGroup
+
+import assets
+import counters
+import importer
+import jobs
+import seed
+from models import app
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+counters_cli = AppGroup('counters', help='Maintain the upcoming/past show counters.')
+
+
+@counters_cli.command('rollover')
+def rollover_command():
+    """Move shows that have started to the past counters (run from cron)."""
+    moved = counters.rollover()
+    click.echo('{} show(s) moved from upcoming to past.'.format(moved))
+
+
+@counters_cli.command('recount')
+def recount_command():
+    """Rebuild every counter from the shows table."""
+    counters.recount()
+    click.echo('Show counters rebuilt.')
+
+
+app.cli.add_command(counters_cli)
+
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+pool_cli = AppGroup('pool', help='Inspect the database connection pool.')
+
+
+@pool_cli.command('stats')
+@click.option('--url', default='http://localhost:5000/_stats/pool', show_default=True,
+              help='Stats endpoint of the running server.')
+def pool_stats_command(url):
+    """Show the connection pool statistics of a running server worker."""
+    # The pool lives in the server processes, this process has its own
+    with urlopen(url) as response:
+        stats = json.load(response)
+
+    histogram = stats.pop('latency_histogram', [])
+    for name, value in sorted(stats.items()):
+        click.echo('{:<14} {}'.format(name, value))
+    if histogram:
+        click.echo('checkout latency:')
+        width = max(bucket['count'] for bucket in histogram) or 1
+        for bucket in histogram:
+            label = '<= {} ms'.format(bucket['le_ms']) if bucket['le_ms'] else 'slower'
+            click.echo('  {:>10} {:>8} {}'.format(
+                label, bucket['count'], '#' * (40 * bucket['count'] // width)))
+
+
+app.cli.add_command(pool_cli)
+
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(importer.IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows validated and inserted per batch.')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+              help='Where to write rejected rows (default: <file>.rejects.jsonl).')
+def import_command(kind, path, batch_size, rejects_path):
+    """Stream a CSV or JSON Lines file of venues, artists or shows into the database."""
+    importer.import_file(kind, path, batch_size=batch_size,
+                         rejects_path=rejects_path, report=click.echo)
+
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=5000, show_default=True)
+@click.option('--shows', default=100000, show_default=True)
+@click.option('--seed', 'seed_value', default=0, show_default=True,
+              help='Random seed, the same seed gives the same rows.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Day the show dates are spread around (default: today).')
+@click.option('--batch-size', default=10000, show_default=True)
+def seed_command(venues, artists, shows, seed_value, anchor, batch_size):
+    """Add a deterministic synthetic dataset of venues, artists and shows."""
+    seed.generate(venues, artists, shows, seed=seed_value,
+                  anchor=anchor.date() if anchor else None,
+                  batch_size=batch_size, report=click.echo)
+
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('worker')
+@click.option('--workers', type=int, help='Jobs run at a time (default: JOB_WORKERS, at least 1).')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+def worker_command(workers, burst):
+    """Run queued background jobs until interrupted."""
+    runner = jobs.JobRunner(app, workers or max(app.config['JOB_WORKERS'], 1))
+    # Jobs enqueued by the jobs themselves wake this runner, not a new one
+    app.extensions['jobs'] = runner
+    click.echo('Running jobs with {} worker(s).'.format(runner.workers))
+    try:
+        runner.run(burst=burst)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.stop()
+    click.echo('{completed} completed, {retried} retried, {failed} failed.'.format(**runner.stats()))
+
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+@assets_cli.command('build')
+def assets_build_command():
+    """Bundle, minify, fingerprint and precompress the CSS and JS."""
+    manifest = assets.build(app.static_folder, report=click.echo)
+    click.echo('{} file(s) built, manifest in static/{}/{}.'.format(
+        len(manifest), assets.OUTPUT_DIR, assets.MANIFEST))
+
+
+app.cli.add_command(assets_cli)
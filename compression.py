@@ -0,0 +1,181 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip only
+    brotli = None
+
+
+#----------------------------------------------------------------------------#
+# Encoders.
+#----------------------------------------------------------------------------#
+
+# Content codings offered, preferred first when the client rates them equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, level, mtime=0)
+
+
+class CompressedBodies:
+    # Recently compressed bodies by content hash. Pages served from the
+    # response cache repeat the same bytes, hashing them is far cheaper
+    # than compressing them again.
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def compress(self, data, encoding, level):
+        key = (hashlib.sha1(data).digest(), encoding, level)
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+                return compressed
+
+        compressed = compress(data, encoding, level)
+        with self.lock:
+            self.entries[key] = compressed
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return compressed
+
+
+bodies = CompressedBodies()
+
+
+class StreamEncoder:
+    # Incremental compressor of a streamed body, flushed after each chunk so
+    # that the client still receives the stream as it is produced
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        else:
+            # wbits 31: gzip container
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def encode_stream(chunks, encoding, level):
+    encoder = StreamEncoder(encoding, level)
+    try:
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            if data:
+                yield encoder.chunk(data)
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+#----------------------------------------------------------------------------#
+# ETags.
+#----------------------------------------------------------------------------#
+
+
+def encoded_etag(etag, encoding):
+    # The representations differ per coding, and so must their ETags
+    return '{}-{}'.format(etag, encoding)
+
+
+def etag_variants(etag):
+    # The ETags this request may hold for a current page: the plain one
+    # (bodies too small to compress keep it) and that of the coding it
+    # would be served in. Another coding's ETag stands for bytes this
+    # client would not be sent.
+    encoding = negotiated_encoding()
+    if encoding is None:
+        return [etag]
+    return [etag, encoded_etag(etag, encoding)]
+
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+
+
+def negotiated_encoding():
+    # The coding of this request's compressed responses, None for identity
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def level_for(encoding, config):
+    return config['COMPRESS_BROTLI_QUALITY'] if encoding == 'br' else config['COMPRESS_LEVEL']
+
+
+def compress_response(response):
+    # after_request hook compressing dynamic text responses
+    config = current_app.config
+    if response.status_code == 304 and response.mimetype in config['COMPRESS_MIMETYPES']:
+        # Same Vary as the 200 it stands for
+        response.vary.add('Accept-Encoding')
+        return response
+    if (
+        response.status_code < 200 or response.status_code in (204, 206, 304)
+        or response.mimetype not in config['COMPRESS_MIMETYPES']
+        or 'Content-Encoding' in response.headers
+        # send_file() responses (static files, thumbnails)
+        or response.direct_passthrough
+        or response.cache_control.no_transform
+    ):
+        return response
+
+    streamed = response.is_streamed
+    if not streamed and response.content_length is not None \
+            and response.content_length < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    # From here the body depends on Accept-Encoding, compressed or not
+    response.vary.add('Accept-Encoding')
+
+    encoding = negotiated_encoding()
+    if encoding is None:
+        return response
+    level = level_for(encoding, config)
+
+    if streamed:
+        response.response = encode_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(bodies.compress(data, encoding, level))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(encoded_etag(etag, encoding), weak)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import g, make_response, request, session
+
+from compression import etag_variants
+
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+
+def make_etag(parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag, last_modified):
+    # The ETag the client has, when it is current (compressed pages carry
+    # the ETag with a -gzip/-br suffix, only that of the coding this request
+    # negotiates is accepted), else None. If-None-Match wins over
+    # If-Modified-Since, as in RFC 7232.
+    if request.if_none_match:
+        for variant in etag_variants(etag):
+            if request.if_none_match.contains(variant):
+                return variant
+        return None
+
+    if request.if_modified_since and last_modified:
+        # HTTP dates have a one second resolution
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        if last_modified <= request.if_modified_since:
+            return etag
+
+    return None
+
+
+def conditional(version):
+    # View decorator answering If-None-Match / If-Modified-Since with a 304
+    # from `version(**view_args)` alone, before the page is built. `version`
+    # returns (parts identifying the content, last modified UTC datetime) or
+    # None when the row does not exist.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Flashed messages must reach the page, never answer them with a 304
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            current = version(**kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+
+            parts, last_modified = current
+            etag = make_etag((request.full_path, parts))
+            # The response cache keys the page by it, a page whose version
+            # changed without an invalidation (a show starting) is rebuilt.
+            # The view may reuse the parts rather than read them again.
+            g.page_etag = etag
+            g.page_version = parts
+
+            current_etag = not_modified(etag, last_modified)
+            if current_etag:
+                # Same ETag as the 200 the client holds
+                response = make_response('', 304)
+                etag = current_etag
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            # Let browsers and the CDN keep the page but check back every time
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from models import Artist, Show, Venue, db
+
+
+#----------------------------------------------------------------------------#
+# Upcoming / past show counters.
+#----------------------------------------------------------------------------#
+
+# Counter owners and the show column pointing at them
+OWNERS = (
+    (Venue, Show.venue_id),
+    (Artist, Show.artist_id),
+)
+
+
+def record_show_added(show):
+    # Count a new show on its venue and artist, in the caller's transaction
+    show.counted_as_past = show.start_time <= datetime.now()
+    # A show built from its venue and artist objects only has their ids,
+    # which the counter updates need, once flushed
+    db.session.add(show)
+    db.session.flush()
+
+    for model, foreign_key in OWNERS:
+        counter = model.past_shows_count if show.counted_as_past else model.upcoming_shows_count
+        model.query.filter(model.id == getattr(show, foreign_key.key)).update(
+            {counter: counter + 1}, synchronize_session=False)
+
+
+def release_shows(criterion):
+    # Uncount the shows matching `criterion` before they are deleted, in the
+    # caller's transaction. One UPDATE per counter owner.
+    for model, foreign_key in OWNERS:
+        def counted(as_past):
+            return db.select(db.func.count(Show.id)).where(
+                foreign_key == model.id,
+                Show.counted_as_past.is_(as_past),
+                criterion
+            ).scalar_subquery()
+
+        model.query.filter(
+            model.id.in_(db.select(foreign_key).where(criterion))
+        ).update({
+            model.upcoming_shows_count: model.upcoming_shows_count - counted(False),
+            model.past_shows_count: model.past_shows_count - counted(True),
+        }, synchronize_session=False)
+
+
+def rollover(now=None):
+    # Move the shows that started since the last run from the upcoming to
+    # the past counters. Returns the number of shows moved.
+    now = now or datetime.now()
+    due = db.and_(Show.counted_as_past.is_(False), Show.start_time <= now)
+
+    for model, foreign_key in OWNERS:
+        moved = db.select(db.func.count(Show.id)).where(
+            foreign_key == model.id, due).scalar_subquery()
+
+        model.query.filter(
+            model.id.in_(db.select(foreign_key).where(due))
+        ).update({
+            model.upcoming_shows_count: model.upcoming_shows_count - moved,
+            model.past_shows_count: model.past_shows_count + moved,
+        }, synchronize_session=False)
+
+    count = Show.query.filter(due).update(
+        {Show.counted_as_past: True}, synchronize_session=False)
+    db.session.commit()
+
+    return count
+
+
+def recount_for(model, foreign_key, ids, chunk_size=1000):
+    # Rebuild the counters of the given venues (or artists) only, from the
+    # counted_as_past flag of their shows
+    ids = list(ids)
+    for start in range(0, len(ids), chunk_size):
+        def counted(as_past):
+            return db.select(db.func.count(Show.id)).where(
+                foreign_key == model.id,
+                Show.counted_as_past.is_(as_past)
+            ).scalar_subquery()
+
+        model.query.filter(model.id.in_(ids[start:start + chunk_size])).update({
+            model.upcoming_shows_count: counted(False),
+            model.past_shows_count: counted(True),
+        }, synchronize_session=False)
+
+    db.session.commit()
+
+
+def recount(now=None):
+    # Rebuild every counter from the shows table, to repair drift
+    now = now or datetime.now()
+
+    Show.query.update(
+        {Show.counted_as_past: Show.start_time <= now}, synchronize_session=False)
+
+    for model, foreign_key in OWNERS:
+        def counted(as_past):
+            return db.select(db.func.count(Show.id)).where(
+                foreign_key == model.id,
+                Show.counted_as_past.is_(as_past)
+            ).scalar_subquery()
+
+        model.query.update({
+            model.upcoming_shows_count: counted(False),
+            model.past_shows_count: counted(True),
+        }, synchronize_session=False)
+
+    db.session.commit()
@@ -0,0 +1,66 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import counters
+import jobs
+import search
+import typeahead
+from models import Artist, Show, Venue, db, response_cache
+
+
+#----------------------------------------------------------------------------#
+# Set-based deletes.
+#----------------------------------------------------------------------------#
+
+# Most ids per DELETE statement, and per bulk delete request
+CHUNK_SIZE = 1000
+
+# Model -> (kind, show column of the owner, kind and show column of the
+# other side). Kinds name typeahead indexes and cache tags.
+OWNERS = {
+    Venue: ('venue', Show.venue_id, 'artist', Show.artist_id),
+    Artist: ('artist', Show.artist_id, 'venue', Show.venue_id),
+}
+
+
+def stale_page_tags(model, ids):
+    # Cached pages showing any of the rows: their own pages, the listings,
+    # and the pages of the other side of their shows, in one query
+    kind, foreign_key, other_kind, other_key = OWNERS[model]
+    other_ids = db.session.query(other_key).filter(foreign_key.in_(ids)).distinct()
+    return [model.__tablename__, 'shows'] + [
+        '{}:{}'.format(kind, row_id) for row_id in ids] + [
+        '{}:{}'.format(other_kind, other_id) for other_id, in other_ids]
+
+
+def delete_owners(model, ids):
+    # Deletes venues or artists with all of their shows and genre links,
+    # which the foreign keys cascade to. Per chunk of ids that is the two
+    # counter UPDATEs of the other side and one DELETE, whatever the number
+    # of shows. Returns the number of rows deleted.
+    kind, foreign_key, _, _ = OWNERS[model]
+    ids = sorted({int(row_id) for row_id in ids})
+    stale_pages = []
+    deleted = 0
+
+    try:
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            stale_pages += stale_page_tags(model, chunk)
+            counters.release_shows(foreign_key.in_(chunk))
+            deleted += model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+        db.session.commit()
+    except:
+        db.session.rollback()
+        raise
+
+    with jobs.follow_up('deleting {} {}'.format(model.__tablename__, ids)):
+        search.remove(model, ids)
+        for row_id in ids:
+            typeahead.remove(kind, row_id)
+        response_cache.invalidate(*dict.fromkeys(stale_pages))
+        jobs.enqueue('warm_pages', paths=['/' + model.__tablename__, '/shows'])
+        db.session.commit()
+
+    return deleted
@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import itertools
+from datetime import date, datetime
+
+from flask import Blueprint, Response, abort, stream_with_context
+
+from api import RESOURCES, build_query, dumps, to_records
+from importer import LIST_SEPARATOR
+
+
+#----------------------------------------------------------------------------#
+# Serialization.
+#----------------------------------------------------------------------------#
+
+# Rows fetched from the server-side cursor, and written out, at a time
+BATCH_SIZE = 1000
+
+
+def csv_value(value):
+    # Same shapes `flask import` reads back: ';' separated genres, ISO dates
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(' ')
+    return value
+
+
+def batches(resource, names, rows):
+    # Records of BATCH_SIZE rows at a time, one chunk of output each
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        yield to_records(resource, names, batch)
+
+
+def csv_chunks(resource, names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield buffer.getvalue()
+
+    for records in batches(resource, names, rows):
+        buffer.seek(0)
+        buffer.truncate()
+        for record in records:
+            writer.writerow([csv_value(record[name]) for name in names])
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(resource, names, rows):
+    for records in batches(resource, names, rows):
+        lines = [dumps(record) for record in records]
+        yield b''.join((line if isinstance(line, bytes) else line.encode('utf-8')) + b'\n'
+                       for line in lines)
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'jsonl': ('application/x-ndjson', jsonl_chunks),
+}
+
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+export = Blueprint('export', __name__, url_prefix='/export')
+
+
+@export.route('/<resource_name>.<format>')
+def export_resource(resource_name, format):
+    resource = RESOURCES.get(resource_name)
+    if resource is None or format not in FORMATS:
+        abort(404)
+    mimetype, chunks = FORMATS[format]
+
+    names = list(resource['fields'])
+    # A server-side cursor (stream_results) read BATCH_SIZE rows at a time, so
+    # memory stays flat however big the table is
+    rows = build_query(resource, names).order_by(
+        resource['model'].id).yield_per(BATCH_SIZE)
+
+    # stream_with_context keeps the app context, and with it the database
+    # session, open until the last row has been sent
+    response = Response(stream_with_context(chunks(resource, names, rows)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(
+        resource_name, format)
+    # Ask nginx not to buffer the whole body before passing it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,18 +1,35 @@
+import os
+
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
+# Route benchmark report the benchmark of `fab test` is compared against,
+# recorded by `fab baseline` and committed
+BASELINE = "benchmark-baseline.json"
+
 # prepare for deployment
 
 
 def test():
+    # Tests, then the route benchmark against the stored baseline, on the
+    # scratch database in $BENCHMARK_DATABASE_URL (see benchmark.py)
+    command = "python benchmark.py --scales 1000 --output benchmark-report.json"
+    if os.path.exists(BASELINE):
+        command += " --baseline " + BASELINE
+    else:
+        print("No {}, run `fab baseline` to record one. Not comparing.".format(BASELINE))
+
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest -q tests && " + command, capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def baseline():
+    # Records the route benchmark of the current code as the baseline
+    local("python benchmark.py --scales 1000 --output " + BASELINE)
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import os
+import threading
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+import formatting
+from models import response_cache
+
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCache:
+    # Rendered template fragments, in the backend of the response cache.
+    # A fragment is keyed by the values given to its {% cache %} tag (an id
+    # and a version stamp of what it shows) and the request's display
+    # settings: a new version is a new key, the old entry simply expires.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, parts):
+        locale, tzinfo = formatting.display_settings()
+        parts = (tuple(parts), locale, str(tzinfo))
+        return 'fragment:' + hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def render(self, parts, render):
+        key = self.key(parts)
+        html = response_cache.backend.get(key)
+        with self.lock:
+            if html is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if html is None:
+            html = str(render())
+            response_cache.backend.set(key, html)
+        return html
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class CacheExtension(Extension):
+    # {% cache 'venue-shows', venue.id, version %}...{% endcache %}
+    # The body, and whatever it calls, only runs on a miss.
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        # The body was escaped when it was rendered
+        return Markup(get_fragment_cache().render(parts, caller))
+
+
+def get_fragment_cache():
+    return current_app.extensions['fragment_cache']
+
+
+#----------------------------------------------------------------------------#
+# Template bytecode.
+#----------------------------------------------------------------------------#
+
+
+def enable_bytecode_cache(app):
+    # Compiled templates on disk, shared by the worker processes and kept
+    # across restarts, so a template is compiled once per change rather than
+    # once per process. Jinja recompiles when the source differs.
+    directory = app.config['TEMPLATE_BYTECODE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = FragmentCache()
+    app.jinja_env.add_extension(CacheExtension)
+    enable_bytecode_cache(app)
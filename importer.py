@@ -0,0 +1,351 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+import counters
+import search
+from forms import ArtistForm, ShowForm, VenueForm
+from models import GENRE_LINKS, Artist, Genre, Show, Venue, db, response_cache
+
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+# Separator of multi-valued columns (genres) in CSV files
+LIST_SEPARATOR = ';'
+
+
+def read_rows(path):
+    # Yields (line number, row dict) from a CSV or JSON Lines file, streaming
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line_number, line in enumerate(source, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as error:
+                        yield line_number, {'_error': str(error), '_line': line}
+        else:
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+
+
+# Column names, as the model and the exports have them, of form fields
+# named differently
+FORM_FIELDS = {
+    'website': 'website_link',
+}
+
+
+def form_datetime(value):
+    # DateTimeField only reads 'YYYY-MM-DD HH:MM:SS'; JSON exports write
+    # ISO 8601 with a 'T'
+    try:
+        return datetime.fromisoformat(value.strip()).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return value
+
+
+def to_formdata(row):
+    # Row values as the multi-valued form data the WTForms forms validate
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None or key is None:
+            continue
+        key = FORM_FIELDS.get(key, key)
+        if isinstance(value, list):
+            values = value
+        elif key == 'genres':
+            values = [genre.strip() for genre in str(value).split(LIST_SEPARATOR) if genre.strip()]
+        elif key == 'start_time':
+            values = [form_datetime(str(value))]
+        elif isinstance(value, bool) or key.startswith('seeking_') and key != 'seeking_description':
+            # BooleanField reads any non-false value as checked
+            values = ['y'] if str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y') else []
+        else:
+            values = [str(value)]
+        for item in values:
+            formdata.add(key, item)
+    return formdata
+
+
+#----------------------------------------------------------------------------#
+# Importers.
+#----------------------------------------------------------------------------#
+
+
+class Importer:
+    # Validates rows with the matching form and inserts them in batches
+
+    model = None
+    form_class = None
+    # Columns that must be present and not blank, checked before the form
+    # whose fields would fall back to their defaults
+    required = ()
+
+    def __init__(self, rejects):
+        self.rejects = rejects
+        self.imported = 0
+        self.rejected = 0
+
+    def validate(self, line_number, row):
+        if '_error' in row:
+            self.reject(line_number, row, {'row': [row.pop('_error')]})
+            return None
+
+        missing = [name for name in self.required if not str(row.get(name) or '').strip()]
+        if missing:
+            self.reject(line_number, row, {name: ['This field is required.'] for name in missing})
+            return None
+
+        form = self.form_class(formdata=to_formdata(row), meta={'csrf': False})
+        if not form.validate():
+            self.reject(line_number, row, form.errors)
+            return None
+
+        try:
+            return self.values(form)
+        except ValueError as error:
+            self.reject(line_number, row, {'row': [str(error)]})
+            return None
+
+    def reject(self, line_number, row, errors):
+        self.rejected += 1
+        self.rejects.write(json.dumps(
+            {'line': line_number, 'row': row, 'errors': errors}, default=str) + '\n')
+
+    def resolve(self, batch):
+        # Hook to check foreign keys of a whole batch, returns the rows to keep
+        return batch
+
+    def import_batch(self, batch):
+        rows = [values for _, _, values in self.resolve(batch)]
+        if rows:
+            insert_model_rows(self.model, rows)
+            self.imported += len(rows)
+
+    def finish(self):
+        pass
+
+
+class VenueImporter(Importer):
+    model = Venue
+    form_class = VenueForm
+
+    def values(self, form):
+        return {
+            'name': form.name.data,
+            'city': form.city.data,
+            'state': form.state.data,
+            'address': form.address.data,
+            'phone': form.phone.data,
+            'image_link': form.image_link.data,
+            'genres': form.genres.data,
+            'facebook_link': form.facebook_link.data,
+            'website': form.website_link.data,
+            'seeking_talent': form.seeking_talent.data,
+            'seeking_description': form.seeking_description.data,
+        }
+
+    def finish(self):
+        # New rows have no search vector yet, and the listing is stale
+        search.reindex_missing(self.model)
+        response_cache.invalidate('venues')
+
+
+class ArtistImporter(Importer):
+    model = Artist
+    form_class = ArtistForm
+
+    def values(self, form):
+        return {
+            'name': form.name.data,
+            'city': form.city.data,
+            'state': form.state.data,
+            'phone': form.phone.data,
+            'image_link': form.image_link.data,
+            'genres': form.genres.data,
+            'facebook_link': form.facebook_link.data,
+            'website': form.website_link.data,
+            'seeking_venue': form.seeking_venue.data,
+            'seeking_description': form.seeking_description.data,
+        }
+
+    def finish(self):
+        search.reindex_missing(self.model)
+        response_cache.invalidate('artists')
+
+
+class ShowImporter(Importer):
+    model = Show
+    form_class = ShowForm
+    # ShowForm defaults start_time to now
+    required = ('artist_id', 'venue_id', 'start_time')
+
+    def __init__(self, rejects):
+        super().__init__(rejects)
+        self.now = datetime.now()
+        self.venue_ids = set()
+        self.artist_ids = set()
+
+    def values(self, form):
+        if not (form.artist_id.data.isdigit() and form.venue_id.data.isdigit()):
+            raise ValueError('artist_id and venue_id must be integer IDs')
+        return {
+            'artist_id': int(form.artist_id.data),
+            'venue_id': int(form.venue_id.data),
+            'start_time': form.start_time.data,
+            'counted_as_past': form.start_time.data <= self.now,
+        }
+
+    def resolve(self, batch):
+        # One query per table for the whole batch
+        artist_ids = {values['artist_id'] for _, _, values in batch}
+        venue_ids = {values['venue_id'] for _, _, values in batch}
+        known_artists = {row_id for row_id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+        known_venues = {row_id for row_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+
+        kept = []
+        for line_number, row, values in batch:
+            if values['artist_id'] not in known_artists:
+                self.reject(line_number, row, {'artist_id': ['Artist ID not found']})
+            elif values['venue_id'] not in known_venues:
+                self.reject(line_number, row, {'venue_id': ['Venue ID not found']})
+            else:
+                kept.append((line_number, row, values))
+                self.artist_ids.add(values['artist_id'])
+                self.venue_ids.add(values['venue_id'])
+        return kept
+
+    def finish(self):
+        counters.recount_for(Venue, Show.venue_id, self.venue_ids)
+        counters.recount_for(Artist, Show.artist_id, self.artist_ids)
+        response_cache.invalidate(
+            'shows', 'venues',
+            *['venue:{}'.format(venue_id) for venue_id in self.venue_ids] +
+            ['artist:{}'.format(artist_id) for artist_id in self.artist_ids])
+
+
+IMPORTERS = {
+    'venues': VenueImporter,
+    'artists': ArtistImporter,
+    'shows': ShowImporter,
+}
+
+
+#----------------------------------------------------------------------------#
+# Writers.
+#----------------------------------------------------------------------------#
+
+
+def copy_value(value):
+    # Value in Postgres COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        value = '{' + ','.join('"{}"'.format(str(item).replace('\\', '\\\\').replace('"', '\\"'))
+                               for item in value) + '}'
+    elif isinstance(value, datetime):
+        value = value.isoformat(' ')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def insert_rows(table, rows):
+    # COPY on Postgres, a batched multi-row INSERT elsewhere
+    if db.engine.dialect.name == 'postgresql':
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_value(row[column]) for column in columns) + '\n')
+        buffer.seek(0)
+
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(table.name, ', '.join(columns)), buffer)
+    else:
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+
+def insert_model_rows(model, rows):
+    # Rows of `model`. Venues and artists carry a list of genre names: they
+    # are inserted with RETURNING to learn their ids, in row order, and their
+    # genre links are then copied in the same transaction.
+    link = GENRE_LINKS.get(model)
+    if link is None:
+        insert_rows(model.__table__, rows)
+        return
+
+    genres = [row.pop('genres', None) or [] for row in rows]
+    named = Genre.named(name for names in genres for name in names)
+    # New genres get their ids
+    db.session.flush()
+    genre_ids = {genre.name: genre.id for genre in named}
+
+    ids = db.session.execute(
+        model.__table__.insert().returning(model.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+
+    links = [{link.name: row_id, 'genre_id': genre_ids[name]}
+             for row_id, names in zip(ids, genres) for name in dict.fromkeys(names)]
+    if links:
+        insert_rows(link.table, links)
+    else:
+        db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+
+def import_file(kind, path, batch_size=1000, rejects_path=None, report=print):
+    # Streams `path` into the `kind` table. Bad rows are written to
+    # `rejects_path` as JSON Lines instead of aborting the load.
+    rejects_path = rejects_path or '{}.rejects.jsonl'.format(os.path.splitext(path)[0])
+    started = time.perf_counter()
+
+    with open(rejects_path, 'w', encoding='utf-8') as rejects:
+        importer = IMPORTERS[kind](rejects)
+        batch = []
+        processed = 0
+
+        for line_number, row in read_rows(path):
+            processed += 1
+            values = importer.validate(line_number, dict(row))
+            if values is not None:
+                batch.append((line_number, row, values))
+
+            if len(batch) >= batch_size:
+                importer.import_batch(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                report('{} rows read, {} imported, {} rejected ({:.0f} rows/s)'.format(
+                    processed, importer.imported, importer.rejected, processed / elapsed))
+
+        if batch:
+            importer.import_batch(batch)
+        importer.finish()
+
+    elapsed = time.perf_counter() - started
+    report('Done: {} rows read, {} imported, {} rejected in {:.1f}s ({:.0f} rows/s).'.format(
+        processed, importer.imported, importer.rejected, elapsed, processed / elapsed if elapsed else 0))
+    if importer.rejected:
+        report('Rejected rows written to {}'.format(rejects_path))
+    else:
+        os.remove(rejects_path)
+
+    return importer
@@ -0,0 +1,374 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import search
+from models import Artist, Job, Venue, db
+
+
+logger = logging.getLogger(__name__)
+
+
+#----------------------------------------------------------------------------#
+# Handlers.
+#----------------------------------------------------------------------------#
+
+# Job name -> function called with the job's payload as keyword arguments
+HANDLERS = {}
+
+MODELS = {
+    'venues': Venue,
+    'artists': Artist,
+}
+
+# Columns of the link check, and its per-request timeout in seconds
+LINK_COLUMNS = ('image_link', 'facebook_link', 'website')
+LINK_TIMEOUT = 5
+
+
+def handler(name):
+    def register(function):
+        HANDLERS[name] = function
+        return function
+    return register
+
+
+@handler('reindex')
+def reindex(table, ids):
+    search.reindex(MODELS[table], ids)
+
+
+@handler('warm_pages')
+def warm_pages(paths):
+    # Renders the pages into the response cache before a visitor asks
+    client = current_app.test_client()
+    for path in paths:
+        client.get(path).close()
+
+
+@handler('check_links')
+def check_links(table, id):
+    # Logs the links of the row that do not answer. Dead links are not
+    # retried: only a failure to read the row fails the job.
+    model = MODELS[table]
+    row = db.session.get(model, id)
+    if row is None:
+        return
+
+    for column in LINK_COLUMNS:
+        url = getattr(row, column, None)
+        if not url or not url.startswith(('http://', 'https://')):
+            continue
+        try:
+            urlopen(Request(url, method='HEAD'), timeout=LINK_TIMEOUT).close()
+        except (HTTPError, URLError, OSError, ValueError) as error:
+            logger.warning('%s %s: %s %s does not answer: %s', table, id, column, url, error)
+
+
+#----------------------------------------------------------------------------#
+# Queue.
+#----------------------------------------------------------------------------#
+
+
+@contextmanager
+def follow_up(change):
+    # Work after a committed change (cache invalidation, queueing its jobs).
+    # The change is saved whatever happens in here, so a failure is logged,
+    # never reported as a failed change.
+    try:
+        yield
+    except Exception:
+        db.session.rollback()
+        logger.exception('Follow-up of %s failed', change)
+
+
+def enqueue(name, delay=0, max_attempts=None, **payload):
+    # Adds a job in the caller's transaction, it is queued once the caller
+    # commits. The runner of this process is woken up on commit.
+    if name not in HANDLERS:
+        raise ValueError('Unknown job {!r}'.format(name))
+
+    job = Job(
+        name=name,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    db.session.info['jobs_enqueued'] = True
+    return job
+
+
+@event.listens_for(Session, 'after_commit')
+def wake_runner(session):
+    if session.info.pop('jobs_enqueued', False) and has_app_context():
+        runner = get_runner(current_app._get_current_object())
+        if runner is not None:
+            runner.wakeup.set()
+
+
+def claim(limit, now=None):
+    # Marks up to `limit` due jobs as running and returns them. SKIP LOCKED
+    # lets several runners claim from the queue without waiting on each
+    # other or taking the same job (SQLite ignores it, a single runner
+    # claims at a time there).
+    now = now or datetime.utcnow()
+    jobs = Job.query.filter(
+        Job.status == 'queued',
+        Job.run_at <= now
+    ).order_by(Job.run_at, Job.id).limit(limit).with_for_update(skip_locked=True).all()
+
+    claimed = []
+    for job in jobs:
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = now
+        claimed.append((job.id, job.name, job.payload, job.attempts, job.max_attempts, job.run_at))
+    db.session.commit()
+
+    return claimed
+
+
+def retry_delay(attempts):
+    # Exponential backoff from JOB_RETRY_DELAY, with jitter so that jobs
+    # failing together do not retry together
+    base = current_app.config['JOB_RETRY_DELAY']
+    return min(base * 2 ** (attempts - 1), 3600) * random.uniform(0.5, 1)
+
+
+def requeue_stale(now=None):
+    # Jobs still running after JOB_TIMEOUT belong to a runner that died,
+    # they go back to the queue
+    now = now or datetime.utcnow()
+    timeout = timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+    count = Job.query.filter(
+        Job.status == 'running',
+        Job.started_at < now - timeout
+    ).update({Job.status: 'queued', Job.run_at: now}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def queue_stats(now=None):
+    # Queue depth per status and age of the oldest due job, for all runners
+    now = now or datetime.utcnow()
+    depth = dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
+    oldest = db.session.query(db.func.min(Job.run_at)).filter(
+        Job.status == 'queued', Job.run_at <= now).scalar()
+
+    return {
+        'queued': depth.get('queued', 0),
+        'running': depth.get('running', 0),
+        'failed': depth.get('failed', 0),
+        'oldest_due_age_s': round((now - oldest).total_seconds(), 3) if oldest else None,
+    }
+
+
+#----------------------------------------------------------------------------#
+# Runner.
+#----------------------------------------------------------------------------#
+
+# Upper bounds, in milliseconds, of the job latency histogram buckets
+LATENCY_BUCKETS = (10, 50, 100, 500, 1000, 5000, 30000, 60000, 300000)
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # One count per bucket, the last one for anything slower
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds):
+        milliseconds = max(seconds, 0) * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+
+    def as_dict(self):
+        return {
+            'avg_ms': round(self.total / self.count, 3) if self.count else None,
+            'max_ms': round(self.max, 3),
+            # A list, JSON objects would lose the bucket order
+            'histogram': [
+                {'le_ms': bound, 'count': count}
+                for bound, count in zip(LATENCY_BUCKETS + (None,), self.buckets)
+            ],
+        }
+
+
+# Guards the lazy start of the in-process runner
+RUNNER_LOCK = threading.Lock()
+
+
+class JobRunner:
+    # Claims due jobs from the table and runs them on a bounded thread pool:
+    # never more than `workers` jobs are claimed and unfinished at a time,
+    # the rest wait in the table
+
+    def __init__(self, app, workers, poll_interval=None):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.last_requeue = 0.0
+
+        self.running = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        # Due to started, and started to finished
+        self.wait_latency = LatencyHistogram()
+        self.run_latency = LatencyHistogram()
+
+    def start(self):
+        # Runs the dispatch loop in a background thread of this process
+        self.thread = threading.Thread(target=self.run, name='job-dispatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def run(self, burst=False):
+        # Dispatches until stopped, or with `burst` until nothing is left
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                claimed = self.dispatch()
+            except Exception:
+                logger.exception('Job dispatch failed')
+                claimed = 0
+
+            with self.lock:
+                idle = self.running == 0
+            if burst and not claimed and idle:
+                return
+            if not claimed:
+                self.wakeup.wait(self.poll_interval)
+
+    def dispatch(self):
+        # Claims as many due jobs as there are free workers, returns how many
+        with self.lock:
+            free = self.workers - self.running
+        if free <= 0:
+            return 0
+
+        with self.app.app_context():
+            try:
+                if time.monotonic() - self.last_requeue > 60:
+                    self.last_requeue = time.monotonic()
+                    requeue_stale()
+                jobs = claim(free)
+            finally:
+                db.session.remove()
+
+        with self.lock:
+            self.running += len(jobs)
+        for job in jobs:
+            self.executor.submit(self.execute, *job)
+        return len(jobs)
+
+    def execute(self, job_id, name, payload, attempts, max_attempts, run_at):
+        started = datetime.utcnow()
+        timer = time.perf_counter()
+        outcome = 'completed'
+
+        try:
+            with self.app.app_context():
+                try:
+                    outcome = self.attempt(job_id, name, payload, attempts, max_attempts)
+                finally:
+                    db.session.remove()
+        except Exception:
+            # The job row could not be updated, requeue_stale() will retry it
+            logger.exception('Job %s %s could not be recorded', job_id, name)
+            outcome = 'retried'
+        finally:
+            with self.lock:
+                self.running -= 1
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                self.wait_latency.add((started - run_at).total_seconds())
+                self.run_latency.add(time.perf_counter() - timer)
+            # A worker is free again
+            self.wakeup.set()
+
+    def attempt(self, job_id, name, payload, attempts, max_attempts):
+        # Runs the handler, then deletes the job or schedules its retry
+        try:
+            HANDLERS[name](**json.loads(payload))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc()
+            if attempts < max_attempts:
+                outcome = 'retried'
+                changes = {
+                    Job.status: 'queued',
+                    Job.run_at: datetime.utcnow() + timedelta(seconds=retry_delay(attempts)),
+                    Job.last_error: error,
+                }
+            else:
+                outcome = 'failed'
+                changes = {Job.status: 'failed', Job.last_error: error}
+                logger.error('Job %s %s failed after %s attempts:\n%s', job_id, name, attempts, error)
+            Job.query.filter(Job.id == job_id).update(changes, synchronize_session=False)
+        else:
+            outcome = 'completed'
+            Job.query.filter(Job.id == job_id).delete(synchronize_session=False)
+
+        db.session.commit()
+        return outcome
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'running': self.running,
+                'completed': self.completed,
+                'retried': self.retried,
+                'failed': self.failed,
+                'wait_latency': self.wait_latency.as_dict(),
+                'run_latency': self.run_latency.as_dict(),
+            }
+
+
+def get_runner(app):
+    # The runner of this process: the in-process one, started on the first
+    # enqueued job, unless JOB_WORKERS is 0 and `flask worker` runs the jobs
+    runner = app.extensions.get('jobs')
+    if runner is None and app.config['JOB_WORKERS'] > 0:
+        with RUNNER_LOCK:
+            runner = app.extensions.get('jobs')
+            if runner is None:
+                runner = app.extensions['jobs'] = JobRunner(app, app.config['JOB_WORKERS'])
+                runner.start()
+    return runner
+
@@ -0,0 +1,60 @@
+"""add indexes for the hot query predicates
+
+Revision ID: 5c1d3e7a9b20
+Revises: 4e178d67b819
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d3e7a9b20'
+down_revision = '4e178d67b819'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so the
+    # indexes are built in autocommit mode and writes are never locked out.
+    with op.get_context().autocommit_block():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+        op.create_index('ix_shows_venue_id_start_time', 'shows',
+                        ['venue_id', 'start_time'], postgresql_concurrently=True)
+        op.create_index('ix_shows_artist_id_start_time', 'shows',
+                        ['artist_id', 'start_time'], postgresql_concurrently=True)
+        op.create_index('ix_shows_start_time_id', 'shows',
+                        ['start_time', 'id'], postgresql_concurrently=True)
+        op.create_index('ix_venues_city_state', 'venues',
+                        ['city', 'state'], postgresql_concurrently=True)
+        op.create_index('ix_artists_city_state', 'artists',
+                        ['city', 'state'], postgresql_concurrently=True)
+
+        # Trigram indexes serve the case-insensitive LIKE '%term%' searches
+        op.create_index('ix_venues_lower_name_trgm', 'venues',
+                        [sa.text('lower(name) gin_trgm_ops')],
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artists_lower_name_trgm', 'artists',
+                        [sa.text('lower(name) gin_trgm_ops')],
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artists_lower_name_trgm', table_name='artists',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_venues_lower_name_trgm', table_name='venues',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_artists_city_state', table_name='artists',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_venues_city_state', table_name='venues',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_shows_start_time_id', table_name='shows',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_shows_artist_id_start_time', table_name='shows',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_shows_venue_id_start_time', table_name='shows',
+                      postgresql_concurrently=True)
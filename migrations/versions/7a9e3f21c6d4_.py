@@ -0,0 +1,48 @@
+"""add search vectors to venues and artists
+
+Revision ID: 7a9e3f21c6d4
+Revises: 5c1d3e7a9b20
+Create Date: 2026-10-18 11:40:07.218553
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '7a9e3f21c6d4'
+down_revision = '5c1d3e7a9b20'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(concat_ws(' ', city, state), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string(genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.add_column('artists', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    op.execute('UPDATE venues SET search_vector = {}'.format(SEARCH_VECTOR))
+    op.execute('UPDATE artists SET search_vector = {}'.format(SEARCH_VECTOR))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_search_vector', 'venues', ['search_vector'],
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artists_search_vector', 'artists', ['search_vector'],
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artists_search_vector', table_name='artists',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_venues_search_vector', table_name='venues',
+                      postgresql_concurrently=True)
+
+    op.drop_column('artists', 'search_vector')
+    op.drop_column('venues', 'search_vector')
@@ -0,0 +1,38 @@
+"""cascade deletes of venues and artists to their shows and genre links
+
+Revision ID: a8c3e5f7d102
+Revises: f2a6d8b1c347
+Create Date: 2026-10-18 23:14:05.271946
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c3e5f7d102'
+down_revision = 'f2a6d8b1c347'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table), constraints named the Postgres way
+FOREIGN_KEYS = (
+    ('shows', 'venue_id', 'venues'),
+    ('shows', 'artist_id', 'artists'),
+    ('venue_genres', 'venue_id', 'venues'),
+    ('artist_genres', 'artist_id', 'artists'),
+)
+
+
+def replace_foreign_keys(ondelete):
+    for table, column, referenced in FOREIGN_KEYS:
+        name = '{}_{}_fkey'.format(table, column)
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referenced, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
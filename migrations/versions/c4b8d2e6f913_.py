@@ -0,0 +1,44 @@
+"""add upcoming/past show counters
+
+Revision ID: c4b8d2e6f913
+Revises: 7a9e3f21c6d4
+Create Date: 2026-10-18 14:05:52.770341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4b8d2e6f913'
+down_revision = '7a9e3f21c6d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.add_column('shows', sa.Column('counted_as_past', sa.Boolean(),
+                                     server_default=sa.false(), nullable=False))
+
+    # Backfill, matching what `flask counters recount` does
+    op.execute('UPDATE shows SET counted_as_past = start_time <= LOCALTIMESTAMP')
+    for table, foreign_key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute("""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM shows
+                    WHERE shows.{foreign_key} = {table}.id AND NOT shows.counted_as_past),
+                past_shows_count = (SELECT count(*) FROM shows
+                    WHERE shows.{foreign_key} = {table}.id AND shows.counted_as_past)
+        """.format(table=table, foreign_key=foreign_key))
+
+
+def downgrade():
+    op.drop_column('shows', 'counted_as_past')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,29 @@
+"""add updated_at timestamps
+
+Revision ID: e1f7a3c9b540
+Revises: c4b8d2e6f913
+Create Date: 2026-10-18 16:21:44.093816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f7a3c9b540'
+down_revision = 'c4b8d2e6f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Stored in UTC, like the application-side default
+    for table in ('venues', 'artists', 'shows'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(),
+                                       server_default=sa.text("timezone('utc', now())"),
+                                       nullable=False))
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        op.drop_column(table, 'updated_at')
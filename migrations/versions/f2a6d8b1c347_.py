@@ -0,0 +1,93 @@
+"""move genres to a genres table
+
+Revision ID: f2a6d8b1c347
+Revises: e1f7a3c9b540
+Create Date: 2026-10-18 21:02:17.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8b1c347'
+down_revision = 'e1f7a3c9b540'
+branch_labels = None
+depends_on = None
+
+# (owner table, link table, link column)
+LINKS = (
+    ('venues', 'venue_genres', 'venue_id'),
+    ('artists', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id_venue_id', 'venue_genres', ['genre_id', 'venue_id'])
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id_artist_id', 'artist_genres', ['genre_id', 'artist_id'])
+
+    # Backfill from the array columns, duplicates and empty names dropped
+    op.execute("""
+        INSERT INTO genres (name)
+        SELECT DISTINCT name FROM (
+            SELECT unnest(genres) AS name FROM venues
+            UNION
+            SELECT unnest(genres) AS name FROM artists
+        ) AS names
+        WHERE coalesce(name, '') <> ''
+        ORDER BY name
+    """)
+    for table, link, owner_id in LINKS:
+        op.execute("""
+            INSERT INTO {link} ({owner_id}, genre_id)
+            SELECT DISTINCT {table}.id, genres.id
+            FROM {table}
+            CROSS JOIN LATERAL unnest({table}.genres) AS listed(name)
+            JOIN genres ON genres.name = listed.name
+        """.format(table=table, link=link, owner_id=owner_id))
+
+    op.drop_column('venues', 'genres')
+    op.drop_column('artists', 'genres')
+
+
+def downgrade():
+    op.add_column('artists', sa.Column('genres', postgresql.ARRAY(sa.VARCHAR()), autoincrement=False, nullable=True))
+    op.add_column('venues', sa.Column('genres', postgresql.ARRAY(sa.VARCHAR()), autoincrement=False, nullable=True))
+
+    for table, link, owner_id in LINKS:
+        op.execute("""
+            UPDATE {table} SET genres = listed.names
+            FROM (
+                SELECT links.{owner_id} AS id, array_agg(genres.name ORDER BY genres.name) AS names
+                FROM {link} AS links JOIN genres ON genres.id = links.genre_id
+                GROUP BY links.{owner_id}
+            ) AS listed
+            WHERE {table}.id = listed.id
+        """.format(table=table, link=link, owner_id=owner_id))
+
+    op.drop_index('ix_artist_genres_genre_id_artist_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id_venue_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('genres')
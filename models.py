@@ -2,10 +2,20 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import sqlite3
+from datetime import datetime
+
 from flask import Flask
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Engine
+
+from cache import ResponseCache
+from pool import InstrumentedQueuePool
+from sqlstats import SQLInstrumentation
 
 
 #----------------------------------------------------------------------------#
@@ -15,8 +25,24 @@ from flask_migrate import Migrate
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+# Pool sizing comes from SQLALCHEMY_ENGINE_OPTIONS, the pool class records
+# checkout latencies for /_stats/pool. Not for SQLite, see config.py.
+engine_options = {}
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    engine_options['poolclass'] = InstrumentedQueuePool
+db = SQLAlchemy(app, engine_options=engine_options)
 migrate = Migrate(app, db)
+response_cache = ResponseCache(app)
+sql_instrumentation = SQLInstrumentation(app)
+
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, and so ON DELETE CASCADE, when asked
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
 
 # TODO: connect to a local postgresql database
 
@@ -26,8 +52,52 @@ migrate = Migrate(app, db)
 #----------------------------------------------------------------------------#
 
 
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def named(cls, names):
+        # The genres called `names`, created when missing, in the given order
+        names = list(dict.fromkeys(name for name in names if name))
+        genres = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+        for name in names:
+            if name not in genres:
+                genres[name] = cls(name=name)
+                db.session.add(genres[name])
+        return [genres[name] for name in names]
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'<Genre ID: {self.id} name: {self.name}>'
+
+
+# Genre links, the (genre_id, owner) index serves the ?genre= filters
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_city_state', 'city', 'state'),
+        db.Index('ix_venues_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String())
@@ -39,12 +109,26 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name',
+                             passive_deletes=True)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
 
-    shows = db.relationship('Show', backref='venue', lazy=True)
+    # Maintained by counters.py on show insert/delete and by the rollover job
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Weighted name/city/state/genres document, maintained by search.py
+    search_vector = db.deferred(db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql')))
+
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now())
+
+    # The database deletes the shows (and genre links) with their venue, the
+    # ORM only deletes the ones already loaded
+    shows = db.relationship('Show', backref='venue', lazy=True, cascade='all',
+                            passive_deletes=True)
 
     def __repr__(self):
         return f'<Venue ID: {self.id} name: {self.name}>'
@@ -52,23 +136,40 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_city_state', 'city', 'state'),
+        db.Index('ix_artists_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String())
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name',
+                             passive_deletes=True)
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
 
-    shows = db.relationship('Show', backref='artist', lazy=True)
+    # Maintained by counters.py on show insert/delete and by the rollover job
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Weighted name/city/state/genres document, maintained by search.py
+    search_vector = db.deferred(db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql')))
+
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now())
+
+    # The database deletes the shows (and genre links) with their artist, the
+    # ORM only deletes the ones already loaded
+    shows = db.relationship('Show', backref='artist', lazy=True, cascade='all',
+                            passive_deletes=True)
 
     def __repr__(self):
         return f'<Artist ID: {self.id} name: {self.name}>'
@@ -78,13 +179,95 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer,
-                          db.ForeignKey('artists.id'), nullable=False)
+                          db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
     venue_id = db.Column(db.Integer,
-                         db.ForeignKey('venues.id'), nullable=False)
+                         db.ForeignKey('venues.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime(), nullable=False)
 
+    # Whether the show is counted in the past (rather than upcoming) counters
+    counted_as_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now())
+
     def __repr__(self):
         return f'<Show ID: {self.id} ArtistID: {self.artist_id} VenueID: {self.venue_id} Start-Time: {self.start_time}>'
+
+
+class Job(db.Model):
+    # Queue of the background jobs run by jobs.py. Finished jobs are deleted,
+    # the ones out of attempts are kept as 'failed'.
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    # JSON encoded keyword arguments of the handler
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # 'queued', 'running' or 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued', server_default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    max_attempts = db.Column(db.Integer, nullable=False, default=5, server_default='5')
+    # Not run before then, pushed back on each retry
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<Job ID: {self.id} name: {self.name} status: {self.status}>'
+
+
+# Trigram indexes of the substring name search (search.py). Declared after
+# the classes, as the expression needs the name columns.
+db.Index('ix_venues_lower_name_trgm', db.func.lower(Venue.name).label('lower_name'),
+         postgresql_using='gin', postgresql_ops={'lower_name': 'gin_trgm_ops'})
+db.Index('ix_artists_lower_name_trgm', db.func.lower(Artist.name).label('lower_name'),
+         postgresql_using='gin', postgresql_ops={'lower_name': 'gin_trgm_ops'})
+
+
+# Genre link column of each model with genres
+GENRE_LINKS = {
+    Venue: venue_genres.c.venue_id,
+    Artist: artist_genres.c.artist_id,
+}
+
+
+def genre_names(model, ids):
+    # {row id: [genre names]} of the given venues or artists, in one query
+    link = GENRE_LINKS[model]
+    rows = db.session.query(link, Genre.name).join(
+        Genre, Genre.id == link.table.c.genre_id
+    ).filter(link.in_(list(ids))).order_by(link, Genre.name)
+
+    names = {}
+    for row_id, name in rows:
+        names.setdefault(row_id, []).append(name)
+    return names
+
+
+def genre_counts(model):
+    # [(genre name, number of venues or artists)] in one grouped query
+    link = GENRE_LINKS[model]
+    return db.session.query(Genre.name, db.func.count(link)).join(
+        link.table, link.table.c.genre_id == Genre.id
+    ).group_by(Genre.name).order_by(Genre.name).all()
+
+
+def with_genre(query, model, name):
+    # `query` restricted to the venues or artists of genre `name`, if any
+    if not name:
+        return query
+    link = GENRE_LINKS[model]
+    return query.join(link.table, link == model.id).join(
+        Genre, Genre.id == link.table.c.genre_id).filter(Genre.name == name)
@@ -0,0 +1,94 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# items: rows of the page, next_cursor / prev_cursor: opaque strings or None
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    # Opaque, url-safe token holding the sort key of a boundary row
+    payload = [value.isoformat() if isinstance(value, datetime) else value
+               for value in values]
+    token = base64.urlsafe_b64encode(
+        json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    # Reverse of encode_cursor(), raises ValueError on a tampered token
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, UnicodeError, json.JSONDecodeError, base64.binascii.Error):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for column, value in zip(columns, payload):
+        if column.type.python_type is datetime:
+            # JSON may hold anything there: a number, null, a list
+            if not isinstance(value, str):
+                raise ValueError('Invalid cursor')
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+        elif isinstance(value, bool) or not isinstance(value, column.type.python_type):
+            raise ValueError('Invalid cursor')
+        values.append(value)
+
+    return tuple(values)
+
+
+def keyset_page(query, columns, cursor=None, direction='next', per_page=30, descending=True):
+    # Fetch one page of `query` ordered by `columns` (the last one must be
+    # unique) starting after the row `cursor` points at. Rows must expose the
+    # ordering columns as attributes named after them.
+    if direction not in ('next', 'prev'):
+        raise ValueError('Invalid direction')
+
+    backwards = direction == 'prev'
+    # Walking backwards through a descending listing is an ascending scan
+    scan_descending = descending != backwards
+
+    if cursor:
+        key = tuple_(*columns)
+        boundary = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < boundary if scan_descending else key > boundary)
+
+    query = query.order_by(*[column.desc() if scan_descending else column.asc()
+                             for column in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = cursor_for(rows[-1])
+        if (has_more and backwards) or (cursor and not backwards):
+            prev_cursor = cursor_for(rows[0])
+
+    return Page(rows, next_cursor, prev_cursor)
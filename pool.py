@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import bisect
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+#----------------------------------------------------------------------------#
+# Checkout statistics.
+#----------------------------------------------------------------------------#
+
+# Upper bounds, in milliseconds, of the checkout latency histogram buckets
+LATENCY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class CheckoutStats:
+    # Latency of pool checkouts: a free connection is near instant, opening
+    # a new one costs a connect, and an exhausted pool blocks until a
+    # connection is returned or pool_timeout expires
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # One count per bucket, the last one for anything slower
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def started(self):
+        with self.lock:
+            self.waiting += 1
+
+    def finished(self, elapsed, timed_out=False):
+        milliseconds = elapsed * 1000
+        with self.lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait += milliseconds
+            self.max_wait = max(self.max_wait, milliseconds)
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'waiting': self.waiting,
+                'avg_wait_ms': round(self.total_wait / self.checkouts, 3) if self.checkouts else None,
+                'max_wait_ms': round(self.max_wait, 3),
+                # A list, JSON objects would lose the bucket order
+                'latency_histogram': [
+                    {'le_ms': bound, 'count': count}
+                    for bound, count in zip(LATENCY_BUCKETS + (None,), self.histogram)
+                ],
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool timing every checkout from the pool
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        self.checkout_stats.started()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_stats.finished(time.perf_counter() - started, timed_out=True)
+            raise
+        except Exception:
+            self.checkout_stats.finished(time.perf_counter() - started)
+            raise
+        self.checkout_stats.finished(time.perf_counter() - started)
+        return connection
+
+
+#----------------------------------------------------------------------------#
+# Reporting.
+#----------------------------------------------------------------------------#
+
+
+def pool_stats(engine):
+    # State of `engine`'s pool in this process. Each worker process has its
+    # own pool, so size it as workers x (pool_size + max_overflow).
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            # Negative while the pool has not opened pool_size connections yet
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.checkout_stats.as_dict())
+
+    return stats
@@ -0,0 +1,266 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import desc
+
+from models import GENRE_LINKS, Genre, db
+
+
+#----------------------------------------------------------------------------#
+# Search documents.
+#----------------------------------------------------------------------------#
+
+# Score of a match in each field, mirroring the A/B/C tsvector weights
+FIELD_SCORES = {
+    'name': 1.0,
+    'city': 0.4,
+    'state': 0.4,
+    'genres': 0.2,
+}
+
+# A term matching only the beginning of a word counts half
+PREFIX_MATCH_FACTOR = 0.5
+
+# Score of a row whose name only contains the search term inside a word
+SUBSTRING_MATCH_SCORE = 0.1
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def name_pattern(term):
+    # LIKE pattern of the term anywhere in a name, as the search did before
+    # it was ranked: "usic" finds "The Musical Hop"
+    escaped = term.strip().lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%{}%'.format(escaped)
+
+
+def document_fields(row):
+    # Text of every searchable field of a venue or artist row
+    return {
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'genres': ' '.join(genre.name for genre in row.genres),
+    }
+
+
+def search_vector_expression(model):
+    # Weighted tsvector built from the same fields as document_fields()
+    def weighted(text, weight):
+        return db.func.setweight(
+            db.func.to_tsvector('simple', db.func.coalesce(text, '')), weight)
+
+    link = GENRE_LINKS[model]
+    genres = db.select(db.func.string_agg(Genre.name, ' ')).join(
+        link.table, link.table.c.genre_id == Genre.id
+    ).where(link == model.id).scalar_subquery()
+    vectors = [
+        weighted(model.name, 'A'),
+        weighted(db.func.concat_ws(' ', model.city, model.state), 'B'),
+        weighted(genres, 'C'),
+    ]
+    return vectors[0].op('||')(vectors[1]).op('||')(vectors[2])
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class PostgresSearchBackend:
+    # Ranks rows by ts_rank over the precomputed `search_vector` column
+
+    def search(self, model, term, limit, offset):
+        tokens = tokenize(term)
+        if not tokens:
+            return [], 0
+
+        # Every term must match the start of some word: "music" finds
+        # "Musical". Or the name contains the term anywhere, through the
+        # trigram index on lower(name); those rows have no rank and come last.
+        query = db.func.to_tsquery(
+            'simple', ' & '.join('{}:*'.format(token) for token in tokens))
+        matches = model.query.filter(db.or_(
+            model.search_vector.op('@@')(query),
+            db.func.lower(model.name).like(name_pattern(term), escape='\\')
+        ))
+
+        total = matches.count()
+        results = matches.order_by(
+            desc(db.func.ts_rank(model.search_vector, query)),
+            model.name,
+            model.id
+        ).limit(limit).offset(offset).all()
+
+        return results, total
+
+    def reindex(self, model, ids):
+        model.query.filter(model.id.in_(ids)).update(
+            {model.search_vector: search_vector_expression(model)},
+            synchronize_session=False)
+        db.session.commit()
+
+    def reindex_missing(self, model):
+        model.query.filter(model.search_vector.is_(None)).update(
+            {model.search_vector: search_vector_expression(model)},
+            synchronize_session=False)
+        db.session.commit()
+
+    def remove(self, model, ids):
+        # Deleting the row removes its search vector with it
+        pass
+
+
+class InvertedIndexBackend:
+    # In-process inverted index used when the database has no full-text
+    # search (SQLite test runs). Built lazily from the table on first use.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def _index_for(self, model):
+        index = self.indexes.get(model.__tablename__)
+        if index is None:
+            index = _InvertedIndex()
+            index.add_rows(model.query.options(db.selectinload(model.genres)).all())
+            self.indexes[model.__tablename__] = index
+        return index
+
+    def search(self, model, term, limit, offset):
+        tokens = tokenize(term)
+        if not tokens:
+            return [], 0
+
+        with self.lock:
+            ranked_ids = self._index_for(model).search(tokens, term.strip().lower())
+
+        page_ids = ranked_ids[offset:offset + limit]
+        rows = {row.id: row for row in model.query.filter(model.id.in_(page_ids))}
+
+        return [rows[row_id] for row_id in page_ids if row_id in rows], len(ranked_ids)
+
+    def reindex(self, model, ids):
+        with self.lock:
+            index = self.indexes.get(model.__tablename__)
+            if index is None:
+                # Not built yet, it will be read fresh from the table
+                return
+            index.remove_ids(ids)
+            index.add_rows(model.query.options(db.selectinload(model.genres)).filter(
+                model.id.in_(ids)).all())
+
+    def reindex_missing(self, model):
+        # Rows written behind our back, rebuild from the table on next use
+        with self.lock:
+            self.indexes.pop(model.__tablename__, None)
+
+    def remove(self, model, ids):
+        with self.lock:
+            index = self.indexes.get(model.__tablename__)
+            if index is not None:
+                index.remove_ids(ids)
+
+
+class _InvertedIndex:
+
+    def __init__(self):
+        self.postings = {}  # token -> {id: weight}
+        self.documents = {}  # id -> (name, tokens)
+        self.sorted_tokens = None
+
+    def add_rows(self, rows):
+        for row in rows:
+            tokens = set()
+            for field, text in document_fields(row).items():
+                weight = FIELD_SCORES[field]
+                for token in tokenize(text):
+                    postings = self.postings.setdefault(token, {})
+                    postings[row.id] = max(postings.get(row.id, 0), weight)
+                    tokens.add(token)
+            self.documents[row.id] = ((row.name or '').lower(), tokens)
+        self.sorted_tokens = None
+
+    def remove_ids(self, ids):
+        for row_id in ids:
+            _, tokens = self.documents.pop(row_id, (None, ()))
+            for token in tokens:
+                postings = self.postings.get(token)
+                postings.pop(row_id, None)
+                if not postings:
+                    del self.postings[token]
+        self.sorted_tokens = None
+
+    def _expand(self, term):
+        # Indexed tokens starting with `term`
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.postings)
+        position = bisect_left(self.sorted_tokens, term)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(term):
+            yield self.sorted_tokens[position]
+            position += 1
+
+    def search(self, terms, substring):
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token in self._expand(term):
+                factor = 1.0 if token == term else PREFIX_MATCH_FACTOR
+                for row_id, weight in self.postings[token].items():
+                    term_scores[row_id] = max(term_scores.get(row_id, 0), weight * factor)
+
+            # Every term has to match somewhere in the document
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {row_id: score + term_scores[row_id]
+                          for row_id, score in scores.items() if row_id in term_scores}
+
+        # Names containing the whole term anywhere, like name_pattern()
+        for row_id, (name, _) in self.documents.items():
+            if row_id not in scores and substring in name:
+                scores[row_id] = SUBSTRING_MATCH_SCORE
+
+        return sorted(scores, key=lambda row_id: (-scores[row_id], self.documents[row_id][0], row_id))
+
+
+#----------------------------------------------------------------------------#
+# Public API.
+#----------------------------------------------------------------------------#
+
+
+def get_backend():
+    backend = current_app.extensions.get('search')
+    if backend is None:
+        if db.engine.dialect.name == 'postgresql':
+            backend = PostgresSearchBackend()
+        else:
+            backend = InvertedIndexBackend()
+        current_app.extensions['search'] = backend
+    return backend
+
+
+def search(model, term, limit=20, offset=0):
+    # Returns (rows ranked by relevance, total number of matches)
+    return get_backend().search(model, term, limit, offset)
+
+
+def reindex(model, ids):
+    get_backend().reindex(model, list(ids))
+
+
+def reindex_missing(model):
+    # Rows written without going through reindex(), e.g. by a bulk import
+    get_backend().reindex_missing(model)
+
+
+def remove(model, ids):
+    get_backend().remove(model, list(ids))
@@ -0,0 +1,178 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+import counters
+import search
+from forms import VenueForm
+from importer import insert_model_rows
+from models import Artist, Show, Venue, db, response_cache
+
+
+#----------------------------------------------------------------------------#
+# Vocabulary.
+#----------------------------------------------------------------------------#
+
+# The values the forms accept, so generated rows can be edited in the UI
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+
+CITIES = (
+    'Springfield', 'Franklin', 'Greenville', 'Clinton', 'Madison', 'Salem',
+    'Georgetown', 'Fairview', 'Riverside', 'Bristol', 'Dover', 'Arlington',
+    'Ashland', 'Burlington', 'Manchester', 'Oxford', 'Jackson', 'Milton',
+    'Newport', 'Auburn',
+)
+VENUE_WORDS = ('Hall', 'Room', 'Lounge', 'Club', 'Theatre', 'Tavern', 'Garden', 'Arena', 'Bar', 'Stage')
+ARTIST_WORDS = ('Band', 'Collective', 'Trio', 'Quartet', 'Project', 'Orchestra', 'Crew', 'Ensemble')
+ADJECTIVES = (
+    'Blue', 'Golden', 'Velvet', 'Electric', 'Silent', 'Wild', 'Crimson', 'Hollow',
+    'Neon', 'Rusty', 'Lucky', 'Midnight', 'Copper', 'Paper', 'Iron', 'Little',
+)
+NOUNS = (
+    'Moon', 'Owl', 'River', 'Fox', 'Lantern', 'Harbor', 'Engine', 'Orchard',
+    'Sparrow', 'Canyon', 'Mirror', 'Wolf', 'Anchor', 'Comet', 'Thistle', 'Echo',
+)
+
+
+#----------------------------------------------------------------------------#
+# Sampling.
+#----------------------------------------------------------------------------#
+
+
+def zipf_weights(count, exponent=1.1):
+    # Cumulative weights of ranks 1..count, rank k drawn ~ 1 / k**exponent
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Sampler:
+    # Draws from `values` with a Zipf skew, after shuffling them so that the
+    # popular values are not simply the first ones
+
+    def __init__(self, rng, values, exponent=1.1):
+        self.rng = rng
+        self.values = list(values)
+        rng.shuffle(self.values)
+        self.cum_weights = zipf_weights(len(self.values), exponent)
+
+    def draw(self, k=1):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+def name(rng, words, number):
+    # Unique thanks to the number, readable thanks to the words
+    return 'The {} {} {} {}'.format(
+        rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(words), number)
+
+
+def phone(rng):
+    return '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999))
+
+
+#----------------------------------------------------------------------------#
+# Generators.
+#----------------------------------------------------------------------------#
+
+
+def owner_rows(rng, model, count, states, cities, genres):
+    # Venue or artist rows, located and tagged with skewed states, cities and genres
+    words = VENUE_WORDS if model is Venue else ARTIST_WORDS
+    slug = model.__tablename__
+    for number in range(1, count + 1):
+        row = {
+            'name': name(rng, words, number),
+            'state': states.draw()[0],
+            'city': cities.draw()[0],
+            'phone': phone(rng),
+            'genres': sorted(set(genres.draw(rng.randint(1, 3)))),
+            'image_link': 'https://picsum.photos/seed/{}-{}/400/300'.format(slug, number),
+            'facebook_link': 'https://www.facebook.com/{}{}'.format(slug, number),
+            'website': 'https://example.com/{}/{}'.format(slug, number),
+            'seeking_description': None,
+        }
+        if model is Venue:
+            row['address'] = '{} {} St'.format(rng.randint(1, 9999), rng.choice(NOUNS))
+            row['seeking_talent'] = rng.random() < 0.3
+        else:
+            row['seeking_venue'] = rng.random() < 0.3
+        seeking = row.get('seeking_talent') or row.get('seeking_venue')
+        if seeking:
+            row['seeking_description'] = 'Looking for {} acts.'.format(row['genres'][0])
+        yield row
+
+
+def show_rows(rng, count, venue_ids, artist_ids, anchor, past_days, future_days):
+    # Shows at Zipf-skewed venues and artists (the top venues get thousands),
+    # in the evening, spread from `past_days` before to `future_days` after
+    # `anchor`
+    venues = Sampler(rng, venue_ids)
+    artists = Sampler(rng, artist_ids)
+    now = datetime.now()
+    for _ in range(count):
+        day = rng.randint(-past_days, future_days)
+        start_time = anchor + timedelta(days=day, hours=rng.randint(18, 23), minutes=rng.choice((0, 30)))
+        yield {
+            'venue_id': venues.draw()[0],
+            'artist_id': artists.draw()[0],
+            'start_time': start_time,
+            'counted_as_past': start_time <= now,
+        }
+
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+
+def load(model, rows, batch_size, report):
+    # Bulk-loads `rows` in batches, with the same COPY path as `flask import`
+    started = time.perf_counter()
+    loaded = 0
+    batch = []
+    for row in itertools.chain(rows, [None]):
+        if row is not None:
+            batch.append(row)
+        if batch and (row is None or len(batch) >= batch_size):
+            insert_model_rows(model, batch)
+            loaded += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            report('{}: {} rows ({:.0f} rows/s)'.format(model.__tablename__, loaded, loaded / elapsed if elapsed else 0))
+    return loaded
+
+
+def new_ids(model, after):
+    return [row_id for row_id, in db.session.query(model.id).filter(model.id > after).order_by(model.id)]
+
+
+def generate(venues, artists, shows, seed=0, anchor=None, past_days=730, future_days=365,
+             batch_size=10000, report=print):
+    # Adds a synthetic dataset to the database. The same seed and anchor
+    # date always give the same rows.
+    rng = random.Random(seed)
+    anchor = datetime.combine(anchor or datetime.now().date(), datetime.min.time())
+
+    states = Sampler(rng, STATES, exponent=0.8)
+    cities = Sampler(rng, CITIES)
+    genres = Sampler(rng, GENRES, exponent=0.9)
+
+    last_venue = db.session.query(db.func.max(Venue.id)).scalar() or 0
+    last_artist = db.session.query(db.func.max(Artist.id)).scalar() or 0
+    load(Venue, owner_rows(rng, Venue, venues, states, cities, genres), batch_size, report)
+    load(Artist, owner_rows(rng, Artist, artists, states, cities, genres), batch_size, report)
+
+    venue_ids, artist_ids = new_ids(Venue, last_venue), new_ids(Artist, last_artist)
+    if shows and venue_ids and artist_ids:
+        load(Show, show_rows(rng, shows, venue_ids, artist_ids, anchor, past_days, future_days),
+             batch_size, report)
+
+    report('Rebuilding counters and search vectors')
+    counters.recount()
+    search.reindex_missing(Venue)
+    search.reindex_missing(Artist)
+    response_cache.invalidate('venues', 'artists', 'shows')
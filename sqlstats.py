@@ -0,0 +1,139 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+#----------------------------------------------------------------------------#
+# Statement fingerprints.
+#----------------------------------------------------------------------------#
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\?|:\w+')
+PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    # Statement shape: literals and bound parameters become '?', IN lists
+    # collapse, so the same query with other values compares equal
+    shape = LITERAL.sub('?', statement)
+    shape = PLACEHOLDER.sub('?', shape)
+    shape = PLACEHOLDER_LIST.sub('?, ...', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+#----------------------------------------------------------------------------#
+# Per-request statistics.
+#----------------------------------------------------------------------------#
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        # Statement shapes run `threshold` times or more, the N+1 signature
+        return [(shape, count) for shape, count in self.fingerprints.most_common()
+                if count >= threshold]
+
+
+class SQLInstrumentation:
+    # Counts the statements and database time of every request, adds them
+    # to the response headers and warns (raises when testing) about requests
+    # over SQL_QUERY_BUDGET statements or repeating a statement shape
+    # SQL_REPEAT_THRESHOLD times. The last requests are kept for /_debug/sql.
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=100)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.recent = deque(maxlen=app.config.get('SQL_RECENT_REQUESTS', 100))
+        app.extensions['sql_instrumentation'] = self
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.sql_stats = RequestStats()
+
+    def _finish(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        milliseconds = stats.duration * 1000
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['Server-Timing'] = 'db;desc="{} queries";dur={:.2f}'.format(
+            stats.count, milliseconds)
+
+        budget = self.app.config.get('SQL_QUERY_BUDGET', 20)
+        repeated = stats.repeated(self.app.config.get('SQL_REPEAT_THRESHOLD', 5))
+        problems = []
+        if budget and stats.count > budget:
+            problems.append('{} queries, over the budget of {}'.format(stats.count, budget))
+        for shape, count in repeated:
+            problems.append('{} runs of: {}'.format(count, shape))
+
+        with self.lock:
+            self.recent.appendleft({
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'queries': stats.count,
+                'duration_ms': round(milliseconds, 3),
+                'repeated': repeated,
+                'problems': problems,
+            })
+
+        if problems:
+            message = '{} {}: {}'.format(request.method, request.path, '; '.join(problems))
+            if self.app.testing:
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning('SQL: %s', message)
+
+        return response
+
+    def requests(self):
+        with self.lock:
+            return list(self.recent)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['sql_started'].pop()
+    # Statements run outside a request (CLI, jobs) are not tracked
+    if has_app_context() and 'sql_stats' in g:
+        g.sql_stats.record(statement, time.perf_counter() - started)
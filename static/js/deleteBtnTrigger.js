@@ -1,29 +1,32 @@
-const deleteVenueBtn = document.querySelector(".delete-venue-btn");
+const deleteButtons = [
+  [".delete-venue-btn", "venues", "Venue"],
+  [".delete-artist-btn", "artists", "Artist"],
+];
 
-if (deleteVenueBtn) {
-  deleteVenueBtn.addEventListener("click", (e) => {
-    e.preventDefault();
+deleteButtons.forEach(([selector, path, label]) => {
+  const deleteBtn = document.querySelector(selector);
 
-    const venueID = e.target.dataset["id"];
+  if (deleteBtn) {
+    deleteBtn.addEventListener("click", (e) => {
+      e.preventDefault();
 
-    console.log(venueID);
+      const id = e.target.dataset["id"];
 
-    fetch(`/venues/${venueID}`, {
-      method: "DELETE",
-    })
-      .then((res) => {
-        return res.json();
+      fetch(`/${path}/${id}`, {
+        method: "DELETE",
       })
-      .then((data) => {
-        console.log(data.status);
-
-        if (data.status === true) {
-          window.location.replace("/");
-        } else {
-          alert(
-            "Venue can not be deleted at the moment. Please try again later."
-          );
-        }
-      });
-  });
-}
+        .then((res) => {
+          return res.json();
+        })
+        .then((data) => {
+          if (data.status === true) {
+            window.location.replace("/");
+          } else {
+            alert(
+              `${label} can not be deleted at the moment. Please try again later.`
+            );
+          }
+        });
+    });
+  }
+});
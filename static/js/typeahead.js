@@ -0,0 +1,41 @@
+const searchInputs = document.querySelectorAll("form.search input[name='search_term']");
+
+searchInputs.forEach((input, index) => {
+  const form = input.closest("form");
+  const type = form.action.includes("/artists/") ? "artist" : "venue";
+
+  const suggestions = document.createElement("datalist");
+  suggestions.id = `search-suggestions-${index}`;
+  form.appendChild(suggestions);
+  input.setAttribute("list", suggestions.id);
+  input.setAttribute("autocomplete", "off");
+
+  let pending = null;
+
+  input.addEventListener("input", () => {
+    const query = input.value.trim();
+
+    clearTimeout(pending);
+    if (!query) {
+      suggestions.innerHTML = "";
+      return;
+    }
+
+    // Wait for a short pause in typing before asking the server
+    pending = setTimeout(() => {
+      fetch(`/search/suggest?type=${type}&q=${encodeURIComponent(query)}`)
+        .then((res) => {
+          return res.json();
+        })
+        .then((data) => {
+          suggestions.innerHTML = "";
+
+          data.results.forEach((result) => {
+            const option = document.createElement("option");
+            option.value = result.name;
+            suggestions.appendChild(option);
+          });
+        });
+    }, 150);
+  });
+});
@@ -0,0 +1,31 @@
+import os
+import sys
+
+# In-memory database, nothing cached, no background job threads. Set before
+# config.py is imported.
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_TYPE'] = 'null'
+os.environ['JOB_WORKERS'] = '0'
+os.environ['TEMPLATE_BYTECODE_DIR'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def app():
+    from app import app
+    from models import db
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
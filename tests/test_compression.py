@@ -0,0 +1,35 @@
+from models import Venue, db
+
+
+def add_venue():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def test_compressed_page_etag(client):
+    venue_id = add_venue()
+    url = '/venues/{}'.format(venue_id)
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    response = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+
+def test_etag_of_another_coding_is_not_current(client):
+    venue_id = add_venue()
+    url = '/venues/{}'.format(venue_id)
+    etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    # The gzip bytes cannot stand for the identity body this client is sent
+    response = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers['ETag'].endswith('-gzip"')
+    assert 'The Musical Hop' in response.get_data(as_text=True)
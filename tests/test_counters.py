@@ -0,0 +1,24 @@
+import time
+from datetime import datetime, timedelta
+
+import counters
+from models import Artist, Show, Venue, db
+
+
+def test_show_built_from_relationships_is_counted(app):
+    venue = Venue(name='The Musical Hop')
+    artist = Artist(name='Guns N Petals')
+    show = Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(seconds=1))
+    counters.record_show_added(show)
+    db.session.commit()
+
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 0)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 0)
+
+    time.sleep(1.1)
+    assert counters.rollover() == 1
+
+    db.session.refresh(venue)
+    db.session.refresh(artist)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (0, 1)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (0, 1)
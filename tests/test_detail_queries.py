@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Genre, Show, Venue, db
+
+
+def add_shows(count):
+    # A venue and an artist sharing `count` shows, half of them upcoming,
+    # each with another artist (or venue) on the other side
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+
+    now = datetime.now()
+    for number in range(count):
+        other_artist = Artist(name='Artist {}'.format(number))
+        other_venue = Venue(name='Venue {}'.format(number))
+        start_time = now + timedelta(days=number - count // 2)
+        db.session.add_all([
+            Show(venue=venue, artist=other_artist if number else artist, start_time=start_time),
+            Show(venue=other_venue, artist=artist, start_time=start_time),
+        ])
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def query_count(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return int(response.headers['X-SQL-Queries'])
+
+
+@pytest.mark.parametrize('page', ['/venues/{venue}', '/artists/{artist}'])
+def test_detail_page_queries_do_not_grow_with_shows(app, client, page):
+    counts = []
+    for shows in (1, 25):
+        venue_id, artist_id = add_shows(shows)
+        counts.append(query_count(client, page.format(venue=venue_id, artist=artist_id)))
+
+    assert counts[0] == counts[1]
+
+
+def add_venues(count):
+    # `count` venues spread over several cities, with genres and one show each
+    genres = Genre.named(['Jazz', 'Blues', 'Folk'])
+    artist = Artist(name='Guns N Petals')
+    now = datetime.now()
+    for number in range(count):
+        venue = Venue(name='Venue {}'.format(number), city='City {}'.format(number % 7),
+                      state='CA' if number % 2 else 'NY', genres=genres[:1 + number % 3])
+        db.session.add(Show(venue=venue, artist=artist,
+                            start_time=now + timedelta(days=number - count // 2)))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('page', ['/venues', '/venues?genre=Jazz'])
+def test_venue_listing_queries_do_not_grow_with_venues(app, client, page):
+    counts = []
+    for venues in (2, 40):
+        add_venues(venues)
+        counts.append(query_count(client, page))
+
+    assert counts[0] == counts[1]
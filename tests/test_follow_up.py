@@ -0,0 +1,46 @@
+import jobs
+import search
+from models import Venue, db
+
+
+VENUE = {
+    'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+    'address': '1015 Folsom Street', 'phone': '123-123-1234', 'genres': 'Jazz',
+    'image_link': 'https://example.com/hop.jpg',
+    'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+    'website_link': 'https://www.themusicalhop.com', 'seeking_description': '',
+}
+
+
+def test_failed_follow_up_keeps_the_change(client, monkeypatch):
+    def enqueue(name, **payload):
+        raise RuntimeError('queue unavailable')
+    monkeypatch.setattr(jobs, 'enqueue', enqueue)
+
+    response = client.post('/venues/create', data=VENUE)
+
+    assert 'was successfully listed' in response.get_data(as_text=True)
+    assert 'could not be listed' not in response.get_data(as_text=True)
+    assert Venue.query.filter_by(name='The Musical Hop').count() == 1
+
+
+def test_failed_delete_follow_up_keeps_the_delete(client, monkeypatch):
+    def remove(model, ids):
+        raise RuntimeError('search index unavailable')
+    monkeypatch.setattr(search, 'remove', remove)
+
+    ids = []
+    for name in ('The Musical Hop', 'Park Square Live Music & Coffee', 'The Dueling Pianos Bar'):
+        venue = Venue(name=name, city='San Francisco', state='CA', address='1015 Folsom Street')
+        db.session.add(venue)
+        db.session.commit()
+        ids.append(venue.id)
+
+    response = client.delete('/venues/{}'.format(ids[0]))
+    assert response.get_json() == {'status': True}
+
+    response = client.delete('/api/v1/venues', json={'ids': ids[1:]})
+    assert response.status_code == 200
+    assert response.get_json() == {'deleted': 2}
+
+    assert Venue.query.count() == 0
@@ -0,0 +1,52 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import importer
+from models import Artist, Genre, Show, Venue, db
+
+
+def import_rows(importer_class, rows):
+    rejects = io.StringIO()
+    rows_importer = importer_class(rejects)
+    for line_number, row in enumerate(rows, 2):
+        rows_importer.validate(line_number, row)
+    return [json.loads(line) for line in rejects.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize('row', [
+    {'artist_id': '1', 'venue_id': '1'},
+    {'artist_id': '1', 'venue_id': '1', 'start_time': ''},
+    {'artist_id': '1', 'venue_id': '1', 'start_time': '  '},
+])
+def test_show_without_start_time_is_rejected(app, row):
+    rejects = import_rows(importer.ShowImporter, [row])
+
+    assert len(rejects) == 1
+    assert list(rejects[0]['errors']) == ['start_time']
+
+
+@pytest.mark.parametrize('format', ['csv', 'jsonl'])
+@pytest.mark.parametrize('resource, importer_class', [
+    ('venues', importer.VenueImporter),
+    ('shows', importer.ShowImporter),
+])
+def test_exports_import_back(app, client, tmp_path, resource, importer_class, format):
+    venue = Venue(
+        name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+        phone='123-123-1234', genres=Genre.named(['Jazz']),
+        image_link='https://example.com/hop.jpg',
+        facebook_link='https://www.facebook.com/TheMusicalHop',
+        website='https://www.themusicalhop.com', seeking_talent=False)
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add(Show(venue=venue, artist=artist, start_time=datetime(2030, 5, 21, 21, 30)))
+    db.session.commit()
+
+    path = tmp_path / 'export.{}'.format(format)
+    path.write_bytes(client.get('/export/{}.{}'.format(resource, format)).get_data())
+    rows = [row for _, row in importer.read_rows(str(path))]
+
+    assert len(rows) == 1
+    assert import_rows(importer_class, rows) == []
@@ -0,0 +1,60 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import counters
+from cache import LRUBackend
+from models import Artist, Show, Venue, db, response_cache
+
+
+@pytest.fixture
+def page_cache(app):
+    backend, response_cache.backend = response_cache.backend, LRUBackend()
+    yield response_cache
+    response_cache.backend = backend
+
+
+def add_show(starts_in):
+    venue = Venue(name='The Musical Hop')
+    artist = Artist(name='Guns N Petals')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + starts_in)
+    db.session.add(show)
+    counters.record_show_added(show)
+    db.session.commit()
+    return venue.id
+
+
+def text(response):
+    return ' '.join(response.get_data(as_text=True).split())
+
+
+def test_cached_page_follows_a_show_starting(client, page_cache):
+    venue_id = add_show(timedelta(seconds=1))
+    before = client.get('/venues/{}'.format(venue_id))
+    assert '1 Upcoming Show' in text(before)
+
+    time.sleep(1.1)
+    counters.rollover()
+
+    after = client.get('/venues/{}'.format(venue_id),
+                       headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert '0 Upcoming Shows' in text(after)
+    assert '1 Past Show' in text(after)
+
+
+def test_if_modified_since_misses_a_show_that_started(client):
+    venue_id = add_show(timedelta(seconds=1))
+    before = client.get('/venues/{}'.format(venue_id))
+
+    time.sleep(1.1)
+
+    after = client.get('/venues/{}'.format(venue_id),
+                       headers={'If-Modified-Since': before.headers['Last-Modified']})
+    assert after.status_code == 200
+    assert after.last_modified > before.last_modified
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from models import Show
+from pagination import decode_cursor, encode_cursor
+
+
+COLUMNS = [Show.start_time, Show.id]
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    raw_cursor({'start_time': 1}),
+    raw_cursor([1, 1]),
+    raw_cursor([None, 1]),
+    raw_cursor([['2026-10-01'], 1]),
+    raw_cursor(['yesterday', 1]),
+    raw_cursor(['2026-10-01T20:00:00', '1']),
+    raw_cursor(['2026-10-01T20:00:00', True]),
+    raw_cursor(['2026-10-01T20:00:00']),
+])
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, COLUMNS)
+
+
+def test_cursor_round_trip():
+    values = (datetime(2026, 10, 1, 20, 0), 7)
+    assert decode_cursor(encode_cursor(values), COLUMNS) == values
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/shows', [1, 1]),
+    ('/shows', [None, 1]),
+    ('/api/v1/shows', [None]),
+    ('/api/v1/shows', ['1']),
+])
+def test_tampered_cursor_is_a_bad_request(client, path, payload):
+    response = client.get(path, query_string={'cursor': raw_cursor(payload)})
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import pytest
+
+import thumbnails
+from models import Venue, db
+
+
+class CountingFetcher:
+
+    def __init__(self, data, content_type):
+        self.data = data
+        self.content_type = content_type
+        self.fetches = 0
+
+    def fetch(self, url):
+        self.fetches += 1
+        if self.data is None:
+            raise thumbnails.FetchError('404 Not Found')
+        return self.data, self.content_type
+
+
+@pytest.fixture
+def image_link(app, tmp_path):
+    app.config['THUMBNAIL_DIR'] = str(tmp_path)
+    app.extensions.pop('thumbnails', None)
+    link = 'https://example.com/hop.png'
+    db.session.add(Venue(name='The Musical Hop', image_link=link))
+    db.session.commit()
+    yield link
+    app.extensions.pop('thumbnails', None)
+    app.extensions.pop('thumbnail_fetcher', None)
+
+
+def use_fetcher(app, fetcher):
+    app.extensions['thumbnail_fetcher'] = fetcher
+    return fetcher
+
+
+def test_without_pillow_only_images_are_served(app, client, image_link, monkeypatch):
+    monkeypatch.setattr(thumbnails, 'Image', None)
+    use_fetcher(app, CountingFetcher(b'<script>alert(1)</script>', 'text/html'))
+
+    response = client.get('/thumbnails/small', query_string={'src': image_link})
+
+    assert response.status_code == 302
+    assert response.location == image_link
+
+
+def test_without_pillow_images_are_served_as_is(app, client, image_link, monkeypatch):
+    monkeypatch.setattr(thumbnails, 'Image', None)
+    use_fetcher(app, CountingFetcher(b'\x89PNG\r\n', 'image/png'))
+
+    response = client.get('/thumbnails/small', query_string={'src': image_link})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+
+
+def test_failed_fetches_are_not_repeated(app, client, image_link):
+    fetcher = use_fetcher(app, CountingFetcher(None, None))
+
+    for _ in range(3):
+        response = client.get('/thumbnails/small', query_string={'src': image_link})
+        assert response.status_code == 302
+
+    assert fetcher.fetches == 1
@@ -0,0 +1,349 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from flask import Blueprint, abort, current_app, redirect, request, send_file, url_for
+
+from models import Artist, Venue, db
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional, originals are served as is
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+
+#----------------------------------------------------------------------------#
+# Fetchers.
+#----------------------------------------------------------------------------#
+
+# Largest source image read, in bytes
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+
+class FetchError(Exception):
+    pass
+
+
+class HTTPFetcher:
+    # Downloads the image from its URL
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def fetch(self, url):
+        # Returns (bytes, content type)
+        try:
+            with urlopen(Request(url, headers={'User-Agent': 'fyyur-thumbnails'}),
+                         timeout=self.timeout) as response:
+                data = response.read(MAX_SOURCE_BYTES + 1)
+                content_type = response.headers.get_content_type()
+        except (OSError, ValueError) as error:
+            raise FetchError(str(error)) from error
+        if len(data) > MAX_SOURCE_BYTES:
+            raise FetchError('larger than {} bytes'.format(MAX_SOURCE_BYTES))
+        return data, content_type
+
+
+class FileFetcher:
+    # Stand-in reading http://host/path from <root>/host/path, for tests and
+    # offline development
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def fetch(self, url):
+        parts = urlsplit(url)
+        path = os.path.abspath(os.path.join(self.root, parts.netloc, parts.path.lstrip('/')))
+        if not path.startswith(self.root + os.sep):
+            raise FetchError('outside of {}'.format(self.root))
+        try:
+            with open(path, 'rb') as source:
+                data = source.read(MAX_SOURCE_BYTES + 1)
+        except OSError as error:
+            raise FetchError(str(error)) from error
+        if len(data) > MAX_SOURCE_BYTES:
+            raise FetchError('larger than {} bytes'.format(MAX_SOURCE_BYTES))
+        return data, mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def create_fetcher(config):
+    # THUMBNAIL_FETCHER is 'http' or 'file:<directory>'
+    name, _, argument = config['THUMBNAIL_FETCHER'].partition(':')
+    if name == 'http':
+        return HTTPFetcher()
+    if name == 'file':
+        return FileFetcher(argument)
+    raise ValueError('Unknown THUMBNAIL_FETCHER {!r}'.format(config['THUMBNAIL_FETCHER']))
+
+
+#----------------------------------------------------------------------------#
+# Thumbnails.
+#----------------------------------------------------------------------------#
+
+# Seconds a source that could not be made into a thumbnail is not fetched
+# again, its page views go straight to the source meanwhile
+FAILURE_TTL = 300
+
+# Bounding boxes, the aspect ratio is kept
+SIZES = {
+    'small': (300, 300),
+    'large': (800, 800),
+}
+JPEG_QUALITY = 85
+
+# Types served as they are without Pillow. Anything else (HTML, SVG) would
+# run as a page of this site.
+PASSTHROUGH_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp')
+
+
+def make_thumbnail(data, content_type, size):
+    # Returns (bytes, content type). Without Pillow the original raster
+    # image is kept, it is still served from the local cache.
+    if Image is None:
+        if content_type not in PASSTHROUGH_TYPES:
+            raise FetchError('not served without Pillow: {}'.format(content_type))
+        return data, content_type
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Lets JPEG decode at a reduced scale, much faster for large photos
+        image.draft('RGB', SIZES[size])
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(SIZES[size])
+        output = io.BytesIO()
+        image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise FetchError('not an image: {}'.format(error)) from error
+    return output.getvalue(), 'image/jpeg'
+
+
+class ThumbnailStore:
+    # Thumbnails on disk under the SHA-256 of their content, so an image
+    # linked from many rows is stored once, and a small index file per
+    # (source URL, size) pointing at them. Past `max_bytes` the least
+    # recently served thumbnails are deleted; index entries left pointing at
+    # them count as misses.
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        # One lock per source being fetched, so each is fetched once
+        self.fetching = {}
+        os.makedirs(os.path.join(directory, 'index'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'blobs'), exist_ok=True)
+
+    def _index_path(self, url, size):
+        key = hashlib.sha256('{}\n{}'.format(size, url).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'index', key)
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, 'blobs', digest[:2], digest)
+
+    def _write(self, path, data):
+        # Write to a temporary file and rename, readers never see half a file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as output:
+            output.write(data)
+        os.replace(temporary_path, path)
+
+    def _read_index(self, url, size):
+        try:
+            with open(self._index_path(url, size)) as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, url, size):
+        # (digest, content type) of a stored thumbnail, or None
+        entry = self._read_index(url, size)
+        try:
+            # The modification time is the LRU clock
+            os.utime(self.blob_path(entry['digest']))
+        except (OSError, KeyError):
+            return None
+        return entry['digest'], entry['type']
+
+    def failed(self, url, size):
+        # Whether making the thumbnail failed less than FAILURE_TTL ago
+        return self._read_index(url, size).get('failed_until', 0) > time.time()
+
+    def put_failure(self, url, size):
+        self._write(self._index_path(url, size),
+                    json.dumps({'failed_until': time.time() + FAILURE_TTL}).encode('utf-8'))
+
+    def put(self, url, size, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            self._write(path, data)
+            self._grew(len(data))
+        self._write(self._index_path(url, size),
+                    json.dumps({'digest': digest, 'type': content_type}).encode('utf-8'))
+        return digest, content_type
+
+    def get_or_create(self, url, size, create):
+        # The stored thumbnail, or the one `create()` returns as
+        # (bytes, content type), made once even under concurrent requests
+        entry = self.get(url, size)
+        if entry is not None:
+            return entry
+
+        with self.lock:
+            lock = self.fetching.setdefault((url, size), threading.Lock())
+        with lock:
+            try:
+                entry = self.get(url, size)
+                if entry is None and self.failed(url, size):
+                    # Failed for a request this one waited on
+                    raise FetchError('failed less than {} seconds ago'.format(FAILURE_TTL))
+                if entry is None:
+                    try:
+                        entry = self.put(url, size, *create())
+                    except FetchError:
+                        self.put_failure(url, size)
+                        raise
+            finally:
+                with self.lock:
+                    self.fetching.pop((url, size), None)
+        return entry
+
+    def _blobs(self):
+        root = os.path.join(self.directory, 'blobs')
+        for directory, _, names in os.walk(root):
+            for name in names:
+                yield os.path.join(directory, name)
+
+    def _grew(self, size):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(os.path.getsize(path) for path in self._blobs())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Least recently served first, down to 90% of the cap so that the
+        # directory is not scanned on every new thumbnail
+        entries = []
+        for path in self._blobs():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+
+def get_store():
+    store = current_app.extensions.get('thumbnails')
+    if store is None:
+        config = current_app.config
+        store = current_app.extensions['thumbnails'] = ThumbnailStore(
+            config['THUMBNAIL_DIR'], config['THUMBNAIL_MAX_BYTES'])
+    return store
+
+
+def get_fetcher():
+    fetcher = current_app.extensions.get('thumbnail_fetcher')
+    if fetcher is None:
+        fetcher = current_app.extensions['thumbnail_fetcher'] = create_fetcher(current_app.config)
+    return fetcher
+
+
+def is_image_link(url):
+    # Only the images of venues and artists are proxied, never any URL
+    return db.session.query(
+        db.or_(
+            db.session.query(Venue.id).filter(Venue.image_link == url).exists(),
+            db.session.query(Artist.id).filter(Artist.image_link == url).exists(),
+        )
+    ).scalar()
+
+
+def thumbnail_url(src, size='small'):
+    # Template helper: the thumbnail of an image_link, empty links kept as is
+    if not src:
+        return src
+    return url_for('thumbnails.thumbnail', size=size, src=src)
+
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+thumbnails = Blueprint('thumbnails', __name__, url_prefix='/thumbnails')
+
+# The image of a URL is not expected to change, a new image gets a new link
+MAX_AGE = 365 * 24 * 3600
+
+
+def source_redirect(src):
+    # The page still shows the image, straight from its source
+    response = redirect(src)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@thumbnails.route('/<size>')
+def thumbnail(size):
+    src = request.args.get('src', '')
+    if size not in SIZES or not src.startswith(('http://', 'https://')):
+        abort(404)
+
+    store = get_store()
+    entry = store.get(src, size)
+    if entry is None:
+        if not is_image_link(src):
+            abort(404)
+        if store.failed(src, size):
+            return source_redirect(src)
+
+        def create():
+            data, content_type = get_fetcher().fetch(src)
+            return make_thumbnail(data, content_type, size)
+
+        try:
+            entry = store.get_or_create(src, size, create)
+        except FetchError as error:
+            logger.warning('No thumbnail of %s: %s', src, error)
+            return source_redirect(src)
+
+    digest, content_type = entry
+    response = send_file(store.blob_path(digest), mimetype=content_type, etag=digest,
+                         conditional=True, max_age=MAX_AGE)
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(MAX_AGE)
+    return response
+
+
+def init_app(app):
+    app.register_blueprint(thumbnails)
+    app.jinja_env.globals['thumbnail_url'] = thumbnail_url
@@ -0,0 +1,143 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+from bisect import bisect_left
+
+from flask import current_app
+
+from models import Artist, Venue
+
+
+#----------------------------------------------------------------------------#
+# Prefix index.
+#----------------------------------------------------------------------------#
+
+# Matches scanned per lookup before ranking, bounds the work for short prefixes
+MAX_CANDIDATES = 200
+
+
+def name_keys(name):
+    # Every suffix of the name that starts a word, so "hop" finds
+    # "The Musical Hop". Paired with the word position for ranking.
+    name = (name or '').lower()
+    return [(name[match.start():], position)
+            for position, match in enumerate(re.finditer(r'\w+', name))]
+
+
+def rank(name, position):
+    # Names starting with the prefix first, then alphabetical
+    return (position > 0, (name or '').lower())
+
+
+class PrefixIndex:
+    # Sorted array of name keys answering prefix queries with a binary search
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.entries = []  # (id, name, word position), parallel to keys
+        self.names = {}  # id -> name currently indexed
+
+    def add(self, row_id, name):
+        with self.lock:
+            self._remove(row_id)
+            for key, position in name_keys(name):
+                index = bisect_left(self.keys, key)
+                self.keys.insert(index, key)
+                self.entries.insert(index, (row_id, name, position))
+            self.names[row_id] = name
+
+    def remove(self, row_id):
+        with self.lock:
+            self._remove(row_id)
+
+    def _remove(self, row_id):
+        if row_id not in self.names:
+            return
+        for key, _ in name_keys(self.names.pop(row_id)):
+            index = bisect_left(self.keys, key)
+            while self.entries[index][0] != row_id:
+                index += 1
+            del self.keys[index]
+            del self.entries[index]
+
+    def load(self, rows):
+        # Bulk build from (id, name) rows, replacing the current content
+        keyed = sorted((key, (row_id, name, position))
+                       for row_id, name in rows
+                       for key, position in name_keys(name))
+        with self.lock:
+            self.keys = [key for key, _ in keyed]
+            self.entries = [entry for _, entry in keyed]
+            self.names = {row_id: name for row_id, name in rows}
+
+    def lookup(self, prefix, limit):
+        # Returns [(id, name, word position)] of the best matches
+        prefix = prefix.lower()
+        matches = {}
+
+        with self.lock:
+            index = bisect_left(self.keys, prefix)
+            end = min(len(self.keys), index + MAX_CANDIDATES)
+            while index < end and self.keys[index].startswith(prefix):
+                row_id, name, position = self.entries[index]
+                if row_id not in matches or position < matches[row_id][2]:
+                    matches[row_id] = self.entries[index]
+                index += 1
+
+        return sorted(matches.values(), key=lambda entry: rank(entry[1], entry[2]))[:limit]
+
+
+#----------------------------------------------------------------------------#
+# Public API.
+#----------------------------------------------------------------------------#
+
+MODELS = {
+    'venue': Venue,
+    'artist': Artist,
+}
+
+
+def get_indexes():
+    # Built from the tables the first time this process needs them
+    indexes = current_app.extensions.get('typeahead')
+    if indexes is None:
+        indexes = {}
+        for kind, model in MODELS.items():
+            index = PrefixIndex()
+            index.load(model.query.with_entities(model.id, model.name).all())
+            indexes[kind] = index
+        current_app.extensions['typeahead'] = indexes
+    return indexes
+
+
+def suggest(prefix, kinds=None, limit=10):
+    # Returns [(kind, id, name)] for names with a word starting with prefix
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+
+    indexes = get_indexes()
+    results = []
+    for kind in kinds or MODELS:
+        results.extend((kind, row_id, name, position)
+                       for row_id, name, position in indexes[kind].lookup(prefix, limit))
+
+    results.sort(key=lambda result: rank(result[2], result[3]))
+    return [(kind, row_id, name) for kind, row_id, name, _ in results[:limit]]
+
+
+def add(kind, row_id, name):
+    # Indexes built later read the row from the table anyway
+    indexes = current_app.extensions.get('typeahead')
+    if indexes is not None:
+        indexes[kind].add(row_id, name)
+
+
+def remove(kind, row_id):
+    indexes = current_app.extensions.get('typeahead')
+    if indexes is not None:
+        indexes[kind].remove(row_id)